@@ -0,0 +1,66 @@
+# app/api/admin_api.py
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.config import settings
+from app.database import engine
+from app.utils.profiler import profiler
+
+router = APIRouter(prefix="/admin", tags=["admin"], include_in_schema=False)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    # Без ADMIN_TOKEN эндпоинтов как будто нет
+    if settings.ADMIN_TOKEN is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Сравнение за постоянное время: по времени ответа токен не подобрать
+    if x_admin_token is None or not secrets.compare_digest(
+        x_admin_token.encode(),
+        settings.ADMIN_TOKEN.encode(),
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.post("/profiler/start", dependencies=[Depends(require_admin)])
+async def start_profiler(
+        interval_ms: float = Query(default=5.0, gt=0),
+        block_threshold_ms: float = Query(default=100.0, gt=0),
+        slow_threshold_ms: float = Query(default=500.0, ge=0),
+):
+    """Start sampling this worker's event loop; restarts with fresh data if running"""
+    profiler.start(
+        engine.sync_engine,
+        interval=interval_ms / 1000,
+        block_threshold=block_threshold_ms / 1000,
+        slow_threshold=slow_threshold_ms / 1000,
+    )
+    return {"running": True}
+
+
+@router.post("/profiler/stop", dependencies=[Depends(require_admin)])
+async def stop_profiler():
+    """Stop sampling; the collected data stays available until the next start"""
+    profiler.stop()
+    return profiler.report()
+
+
+@router.get("/profiler/report", dependencies=[Depends(require_admin)])
+async def get_profiler_report():
+    """Loop blocks and slow requests/frames with their SQL statements"""
+    return profiler.report()
+
+
+@router.get(
+    "/profiler/flamegraph",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(require_admin)],
+)
+async def get_flamegraph():
+    """Samples as folded stacks for flamegraph.pl, speedscope or inferno"""
+    return PlainTextResponse(
+        profiler.folded(),
+        headers={"Content-Disposition": 'attachment; filename="profile.folded"'},
+    )
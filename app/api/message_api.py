@@ -1,43 +1,143 @@
 # app/api/message_api.py
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Header, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.config import settings
+from app.database import AsyncSessionLocal, get_db
 from app.schemas.message_schema import MessageList
-from app.services.message_service import MessageService
+from app.services.message_service import MessageService, history_etag
+from app.utils.metrics import history_latency
+from app.utils.profiler import profiler
 
 router = APIRouter(prefix="/api", tags=["messages"])
 
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates or "*" in candidates
+
 
 @router.get(
     "/history/{chat_id}",
     response_model=MessageList,
-    description="Get chat message history with pagination",
+    description="Get chat message history with offset or cursor pagination",
+    responses={304: {"description": "History page has not changed"}},
 )
 async def get_chat_history(
         chat_id: int,
         limit: Optional[int] = Query(default=50, ge=1, le=100),
         offset: Optional[int] = Query(default=0, ge=0),
+        before: Optional[str] = Query(default=None),
+        after: Optional[str] = Query(default=None),
+        latest: bool = Query(default=False),
+        if_none_match: Optional[str] = Header(default=None),
         db: AsyncSession = Depends(get_db),
 ):
     """Get chat message history with pagination.
 
+    Offset mode is used when none of ``before``, ``after`` and ``latest``
+    is given. Cursor mode ignores ``offset`` and costs the same at any depth.
+    Responses carry an ETag of the page; a matching ``If-None-Match`` gets
+    304 without serializing or sending it. The page is serialized once, straight
+    from the models built from the rows, not re-validated against
+    ``response_model``. With ``HISTORY_RENDER=postgres`` Postgres renders
+    the page itself and its JSON is sent as is.
+
     Args:
         chat_id: ID of the chat
         limit: Maximum number of messages to return (default: 50)
         offset: Number of messages to skip (default: 0)
+        before: Cursor; return messages older than this position
+        after: Cursor; return messages newer than this position
+        latest: Return the newest page; continue with ``before``
+        if_none_match: ETag of the page the client already has
+        db: Database session
 
     Returns:
-        List of messages sorted by timestamp in ascending order
+        List of messages sorted by timestamp in ascending order and
+        ``next_cursor`` to continue in the same direction
 
     """
     message_service = MessageService(db)
 
-    # message history
-    return await message_service.get_chat_history(
-        chat_id=chat_id,
-        limit=limit,
-        offset=offset,
+    with history_latency.time(), profiler.trace("history", f"/api/history/{chat_id}"):
+        params = {
+            "chat_id": chat_id,
+            "limit": limit,
+            "offset": offset,
+            "before": before,
+            "after": after,
+            "latest": latest,
+        }
+        # ETag считается по самой странице: страница из кэша проверяется без запроса
+        page = None
+        if settings.HISTORY_RENDER == "postgres":
+            body = await message_service.get_chat_history_json(**params)
+            etag = history_etag(body)
+        else:
+            page = await message_service.get_chat_history(**params)
+            etag = history_etag(page)
+
+        headers = {"ETag": etag, "Cache-Control": settings.HISTORY_CACHE_CONTROL}
+        if etag_matches(etag, if_none_match):
+            return Response(status_code=304, headers=headers)
+        if page is not None:
+            body = page.model_dump_json()
+        return Response(body, media_type="application/json", headers=headers)
+
+
+async def stream_chat_export(chat_id: int, export_format: str):
+    # Отдельная сессия: зависимость get_db закрывается до отправки тела ответа
+    async with AsyncSessionLocal() as session:
+        async for chunk in MessageService(session).export_chat_history(
+            chat_id,
+            export_format,
+            settings.HISTORY_EXPORT_CHUNK_ROWS,
+        ):
+            yield chunk
+
+
+@router.get(
+    "/history/{chat_id}/export",
+    response_class=StreamingResponse,
+    description="Stream the whole chat history as NDJSON or CSV",
+)
+async def export_chat_history(
+        chat_id: int,
+        export_format: str = Query(default="ndjson", alias="format", pattern="^(ndjson|csv)$"),
+        db: AsyncSession = Depends(get_db),
+):
+    """Stream the whole chat history.
+
+    Rows are read through a server-side cursor and sent in chunks; the
+    next chunk is read only after the previous one was written to the
+    client, so memory stays constant regardless of chat size.
+
+    Args:
+        chat_id: ID of the chat
+        export_format: ``ndjson`` (default) or ``csv``
+        db: Database session
+
+    Returns:
+        Messages sorted by timestamp in ascending order
+
+    """
+    await MessageService(db).check_chat_exists(chat_id)
+
+    return StreamingResponse(
+        stream_chat_export(chat_id, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="chat_{chat_id}.{export_format}"',
+        },
     )
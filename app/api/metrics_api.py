@@ -0,0 +1,20 @@
+# app/api/metrics_api.py
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.utils.metrics import registry
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    description="Metrics of this worker process in the Prometheus text format",
+)
+async def get_metrics():
+    """Metrics of the worker process that serves the request"""
+    return PlainTextResponse(
+        registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
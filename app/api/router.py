@@ -1,7 +1,11 @@
 # app/api/router.py
 from fastapi import APIRouter
 
+from .admin_api import router as admin_router
 from .message_api import router as message_router
+from .metrics_api import router as metrics_router
 
 router = APIRouter()
 router.include_router(message_router)
+router.include_router(metrics_router)
+router.include_router(admin_router)
@@ -1,101 +1,271 @@
-from fastapi import WebSocket, status
-from sqlalchemy.ext.asyncio import AsyncSession, async_session
+import asyncio
+import json
+from typing import Dict, FrozenSet, List, Optional, Tuple, Union
+
+from fastapi import HTTPException, WebSocket, status
 from starlette.websockets import WebSocketDisconnect
+from app.config import settings
+from app.database import AsyncSessionLocal
 from app.schemas.message_schema import MessageCreate
 from app.schemas.websocket_schema import WebSocketMessage
+from app.services.broadcast import create_broadcast_backend
 from app.services.chat_service import ChatService
 from app.services.message_service import MessageService
+from app.services.message_writer import MessageBatchWriter
 from app.services.websocket_service import WebSocketManager
-from app.utils.logger import logger
+from app.utils.codec import ACK_FRAME, create_codec
+from app.utils.logger import logger, message_logger
+from app.utils.metrics import registry, ws_stage_latency
+from app.utils.profiler import profiler
 
-import json
+frame_codec = create_codec(settings.WS_CODEC)
 
-websocket_manager = WebSocketManager()
+websocket_manager = WebSocketManager(
+    send_timeout=settings.WS_SEND_TIMEOUT,
+    max_queue=settings.WS_OUTBOUND_QUEUE_SIZE,
+    overflow_policy=settings.WS_OVERFLOW_POLICY,
+    backend=create_broadcast_backend(settings.BROADCAST_BACKEND, settings.REDIS_URL),
+    codec=frame_codec,
+    binary_threshold=settings.WS_BINARY_FRAME_THRESHOLD,
+    session_factory=AsyncSessionLocal,
+)
 
+registry.stats("chat_ws", "WebSocket manager", websocket_manager.stats)
 
-async def get_db_for_websocket():
-    async with async_session() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+validate_latency = ws_stage_latency.labels("validate")
+membership_latency = ws_stage_latency.labels("membership")
+insert_latency = ws_stage_latency.labels("insert")
+broadcast_latency = ws_stage_latency.labels("broadcast")
+
+message_writer = MessageBatchWriter(
+    AsyncSessionLocal,
+    max_batch=settings.MESSAGE_BATCH_SIZE,
+    max_delay=settings.MESSAGE_BATCH_DELAY,
+) if settings.MESSAGE_WRITE_BEHIND else None
 
 
 async def handle_websocket_message(
-        data: dict,
+        data: Union[str, bytes],
         user_id: int,
         message_service: MessageService,
         chat_service: ChatService,
-) -> WebSocketMessage:
+) -> Tuple[WebSocketMessage, Optional[int]]:
+    """Validate and store one frame; returns it with the stored message id"""
     try:
-        message_data = WebSocketMessage(**data)
-        logger.info(f"Processing message from user {user_id}: {data}")
+        # Валидация сразу из JSON, без промежуточного dict
+        with validate_latency.time():
+            message_data = frame_codec.decode_message(data)
+        message_logger.info("Processing message from user %s: %s", user_id, data)
 
-        chat = await chat_service.get_chat(message_data.chat_id)
-        if user_id not in [p.id for p in chat.participants]:
-            logger.warning(f"User {user_id} attempted to access chat {message_data.chat_id} without permission")
+        with membership_latency.time():
+            participant_ids = await chat_service.get_participant_ids(message_data.chat_id)
+        if user_id not in participant_ids:
+            logger.warning("User %s attempted to access chat %s without permission", user_id, message_data.chat_id)
             raise ValueError("User is not a participant of this chat")
 
+        message_id = None
         if message_data.type == "message":
             receiver_id = next(
-                p.id for p in chat.participants
-                if p.id != user_id
+                p for p in participant_ids
+                if p != user_id
             )
-            logger.info(f"Creating message: sender={user_id}, receiver={receiver_id}, chat={message_data.chat_id}")
+            message_logger.info("Creating message: sender=%s, receiver=%s, chat=%s", user_id, receiver_id, message_data.chat_id)
 
-            await message_service.create_message(
-                MessageCreate(
-                    chat_id=message_data.chat_id,
-                    text=message_data.content,
-                    receiver_id=receiver_id,
-                ),
-                sender_id=user_id,
-            )
+            with insert_latency.time():
+                stored = await message_service.create_message(
+                    MessageCreate(
+                        chat_id=message_data.chat_id,
+                        text=message_data.content,
+                        receiver_id=receiver_id,
+                    ),
+                    sender_id=user_id,
+                )
+            message_id = stored.id
 
-        return message_data
+        return message_data, message_id
 
     except ValueError as e:
-        logger.error(f"Invalid message format from user {user_id}: {e!s}")
+        logger.error("Invalid message format from user %s: %s", user_id, e)
         raise
 
 
-async def websocket_endpoint(
-        websocket: WebSocket,
-        user_id: int
-):
-    await websocket.accept()
+async def handle_websocket_batch(
+        frames: List[Union[str, bytes]],
+        user_id: int,
+        message_service: MessageService,
+        chat_service: ChatService,
+) -> Tuple[List[Tuple[WebSocketMessage, Optional[int]]], List[int], int]:
+    """Process the frames buffered on one connection together.
+
+    Membership is checked once per chat and all chat messages are stored
+    in one transaction. Invalid frames are rejected one by one instead of
+    closing the connection.
+
+    Returns:
+        Accepted frames with their stored message ids, ids of the stored
+        messages, number of rejected frames
 
-    async with async_session() as session:
-        message_service = MessageService(session)
-        chat_service = ChatService(session)
+    """
+    accepted: List[WebSocketMessage] = []
+    to_store: List[MessageCreate] = []
+    rejected = 0
+    participants: Dict[int, Optional[FrozenSet[int]]] = {}
 
+    for data in frames:
         try:
-            user_chats = await chat_service.get_user_chats(user_id)
-            await websocket_manager.connect(websocket, user_id)
+            with validate_latency.time():
+                message_data = frame_codec.decode_message(data)
+        except ValueError as e:
+            logger.error("Invalid message format from user %s: %s", user_id, e)
+            rejected += 1
+            continue
+        message_logger.info("Processing message from user %s: %s", user_id, data)
 
-            for chat in user_chats:
-                websocket_manager.add_user_to_chat(user_id, chat.id)
+        chat_id = message_data.chat_id
+        if chat_id not in participants:
+            try:
+                with membership_latency.time():
+                    participants[chat_id] = await chat_service.get_participant_ids(chat_id)
+            except HTTPException:
+                participants[chat_id] = None
 
-            while True:
-                try:
-                    data = await websocket.receive_text()
-                    message_data = json.loads(data)
+        participant_ids = participants[chat_id]
+        if participant_ids is None or user_id not in participant_ids:
+            logger.warning("User %s attempted to access chat %s without permission", user_id, chat_id)
+            rejected += 1
+            continue
 
-                    # Process message and send response
-                    await websocket.send_text(json.dumps({"status": "received"}))
+        if message_data.type == "message":
+            receiver_id = next((p for p in participant_ids if p != user_id), None)
+            if receiver_id is None:
+                rejected += 1
+                continue
+            to_store.append(
+                MessageCreate(
+                    chat_id=chat_id,
+                    text=message_data.content,
+                    receiver_id=receiver_id,
+                ),
+            )
+        accepted.append(message_data)
 
-                    processed_message = await handle_websocket_message(
-                        message_data,
+    with insert_latency.time():
+        stored = await message_service.create_messages(to_store, sender_id=user_id)
+    message_ids = [message.id for message in stored]
+
+    # Сохранённые сообщения идут в том же порядке, что и принятые кадры типа message
+    stored_ids = iter(message_ids)
+    return [
+        (message_data, next(stored_ids) if message_data.type == "message" else None)
+        for message_data in accepted
+    ], message_ids, rejected
+
+
+async def receive_messages(websocket: WebSocket, user_id: int):
+    """Handle frames one at a time: ack, store, broadcast"""
+    while True:
+        try:
+            data = await websocket.receive_text()
+
+            # Process message and send response
+            await websocket_manager.send_personal_message(user_id, ACK_FRAME)
+
+            with profiler.trace("frame", f"user {user_id}"):
+                async with AsyncSessionLocal() as session:
+                    processed_message, message_id = await handle_websocket_message(
+                        data,
                         user_id,
-                        message_service,
-                        chat_service,
+                        MessageService(session, writer=message_writer),
+                        ChatService(session),
                     )
 
+                with broadcast_latency.time():
                     await websocket_manager.broadcast_to_chat(
                         processed_message,
                         exclude_user_id=user_id,
+                        message_id=message_id,
                     )
-                except WebSocketDisconnect:
+        except WebSocketDisconnect:
+            break
+
+
+async def _read_frames(websocket: WebSocket, inbox: asyncio.Queue):
+    try:
+        while True:
+            await inbox.put(await websocket.receive_text())
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    # None - признак закрытого соединения
+    await inbox.put(None)
+
+
+async def receive_message_batches(websocket: WebSocket, user_id: int):
+    """Handle every frame already buffered on the socket as one batch.
+
+    A reader task moves frames into a bounded inbox; each round drains
+    what is there, stores it in one transaction and sends one ack listing
+    the stored message ids.
+    """
+    inbox: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_INBOUND_BATCH_SIZE)
+    reader = asyncio.create_task(_read_frames(websocket, inbox))
+
+    try:
+        closed = False
+        while not closed:
+            frame = await inbox.get()
+            if frame is None:
+                break
+
+            frames = [frame]
+            while len(frames) < settings.WS_INBOUND_BATCH_SIZE and not inbox.empty():
+                frame = inbox.get_nowait()
+                if frame is None:
+                    closed = True
                     break
-        finally:
-            websocket_manager.disconnect(user_id)
\ No newline at end of file
+                frames.append(frame)
+
+            with profiler.trace("frames", f"user {user_id}, {len(frames)} frames"):
+                async with AsyncSessionLocal() as session:
+                    accepted, message_ids, rejected = await handle_websocket_batch(
+                        frames,
+                        user_id,
+                        MessageService(session),
+                        ChatService(session),
+                    )
+
+            await websocket_manager.send_personal_message(
+                user_id,
+                json.dumps({"status": "received", "message_ids": message_ids, "rejected": rejected}),
+            )
+            for message_data, message_id in accepted:
+                with broadcast_latency.time():
+                    await websocket_manager.broadcast_to_chat(
+                        message_data,
+                        exclude_user_id=user_id,
+                        message_id=message_id,
+                    )
+    finally:
+        reader.cancel()
+
+
+async def websocket_endpoint(
+        websocket: WebSocket,
+        user_id: int
+):
+    # Сессия берётся из пула только на время запроса, а не на всё соединение;
+    # один запрос к chat_users, чтобы волна переподключений не нагружала БД
+    async with AsyncSessionLocal() as session:
+        user_chats = await ChatService(session).get_user_chat_summaries(user_id)
+
+    await websocket_manager.connect(websocket, user_id)
+
+    try:
+        for chat in user_chats:
+            websocket_manager.add_user_to_chat(user_id, chat.chat_id)
+
+        if settings.WS_INBOUND_BATCH:
+            await receive_message_batches(websocket, user_id)
+        else:
+            await receive_messages(websocket, user_id)
+    finally:
+        websocket_manager.disconnect(user_id, websocket)
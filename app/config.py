@@ -1,16 +1,112 @@
+from typing import Optional
+
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
+# Значения по умолчанию для настроек, не заданных явно
+PROFILES = {
+    "development": {
+        "DB_ECHO": True,
+        "DB_PREPARED_STATEMENT_CACHE_SIZE": 100,
+        "DB_POOL_PRE_PING": False,
+        "LOG_QUEUE": False,
+        "LOG_FORMAT": "text",
+    },
+    "production": {
+        "DB_ECHO": False,
+        "DB_PREPARED_STATEMENT_CACHE_SIZE": 500,
+        "DB_POOL_PRE_PING": True,
+        "LOG_QUEUE": True,
+        "LOG_FORMAT": "json",
+    },
+}
+
 
 class Settings(BaseSettings):
+    APP_PROFILE: str = "development"  # development, production
+
     DB_NAME: str
     DB_USER: str
     DB_PASSWORD: str
     DB_HOST: str
     DB_PORT: int
 
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = -1
+    DB_ECHO: Optional[bool] = None
+    DB_PREPARED_STATEMENT_CACHE_SIZE: Optional[int] = None
+    DB_STATEMENT_TIMEOUT_MS: Optional[int] = None
+    DB_POOL_PRE_PING: Optional[bool] = None
+
+    LOG_LEVEL: str = "INFO"
+    LOG_QUEUE: Optional[bool] = None
+    LOG_FORMAT: Optional[str] = None  # text, json
+    LOG_MESSAGE_SAMPLE_RATE: float = 1.0
+    LOG_MESSAGE_MAX_PER_SECOND: int = 0  # 0 - без ограничения
+
+    WS_SEND_TIMEOUT: float = 5.0
+    WS_OUTBOUND_QUEUE_SIZE: int = 256
+    WS_OVERFLOW_POLICY: str = "drop_oldest"  # drop_oldest, coalesce, disconnect
+    WS_CODEC: str = "pydantic"  # pydantic, orjson, msgspec
+    WS_BINARY_FRAME_THRESHOLD: int = 0  # 0 - всегда текстовые кадры
+    WS_INBOUND_BATCH: bool = False
+    WS_INBOUND_BATCH_SIZE: int = 100
+
+    MEMBERSHIP_CACHE_SIZE: int = 10000
+    MEMBERSHIP_CACHE_TTL: float = 60.0
+
+    HISTORY_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 0 - кэш выключен
+    HISTORY_CACHE_MESSAGES_PER_CHAT: int = 100
+    HISTORY_CACHE_TTL: float = 5.0
+    HISTORY_CACHE_CONTROL: str = "private, no-cache"
+    HISTORY_EXPORT_CHUNK_ROWS: int = 1000
+    HISTORY_RENDER: str = "python"  # python, postgres (json_agg, без кэша истории)
+
+    MESSAGE_WRITE_BEHIND: bool = False
+    MESSAGE_BATCH_SIZE: int = 100
+    MESSAGE_BATCH_DELAY: float = 0.005
+    MESSAGE_PARTITION_MONTHS_AHEAD: int = 3
+    MESSAGE_RETENTION_MONTHS: int = 0  # 0 - хранить всю историю
+    MESSAGE_PARTITION_MAINTENANCE_INTERVAL: float = 6 * 3600
+
+    BROADCAST_BACKEND: str = "memory"  # memory, postgres, redis
+    REDIS_URL: Optional[str] = None
+
+    ADMIN_TOKEN: Optional[str] = None  # None - админские эндпоинты выключены
+
+    @model_validator(mode="after")
+    def apply_profile(self) -> "Settings":
+        if self.APP_PROFILE not in PROFILES:
+            msg = f"Unknown APP_PROFILE: {self.APP_PROFILE}"
+            raise ValueError(msg)
+        for name, value in PROFILES[self.APP_PROFILE].items():
+            if getattr(self, name) is None:
+                setattr(self, name, value)
+        return self
+
     def get_database_url(self) -> str:
         return f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    def get_engine_url(self) -> str:
+        return f"{self.get_database_url()}?prepared_statement_cache_size={self.DB_PREPARED_STATEMENT_CACHE_SIZE}"
+
+    def get_engine_options(self) -> dict:
+        server_settings = {}
+        if self.DB_STATEMENT_TIMEOUT_MS is not None:
+            server_settings["statement_timeout"] = str(self.DB_STATEMENT_TIMEOUT_MS)
+
+        return {
+            "echo": self.DB_ECHO,
+            "pool_size": self.DB_POOL_SIZE,
+            "max_overflow": self.DB_MAX_OVERFLOW,
+            "pool_timeout": self.DB_POOL_TIMEOUT,
+            "pool_recycle": self.DB_POOL_RECYCLE,
+            "pool_pre_ping": self.DB_POOL_PRE_PING,
+            "connect_args": {"server_settings": server_settings},
+        }
+
     class Config:
         env_file = ".env"
 
@@ -1,12 +1,57 @@
+import time
+
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.util.queue import AsyncAdaptedQueue
 
 from app.config import settings
+from app.utils.metrics import db_connect, db_pool_wait, registry
+
+
+class InstrumentedQueue(AsyncAdaptedQueue):
+    """Pool queue that records how long each checkout waits for a returned connection"""
+
+    def get(self, block: bool = True, timeout=None):
+        started = time.perf_counter()
+        try:
+            return super().get(block, timeout)
+        finally:
+            db_pool_wait.observe(time.perf_counter() - started)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records checkout waits and, separately, new connections.
+
+    A checkout waits only on the queue of idle connections; opening a new
+    connection when the pool has room goes to ``db_connect`` instead.
+    """
+
+    _queue_class = InstrumentedQueue
+
+    def _create_connection(self):
+        started = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            db_connect.observe(time.perf_counter() - started)
+
 
 engine = create_async_engine(
-    settings.get_database_url(),
-    echo=True,
+    settings.get_engine_url(),
     future=True,
+    poolclass=InstrumentedPool,
+    **settings.get_engine_options(),
+)
+
+registry.stats(
+    "chat_db_pool",
+    "Database connection pool",
+    lambda: {
+        "size": engine.sync_engine.pool.size(),
+        "checked_out": engine.sync_engine.pool.checkedout(),
+        "overflow": engine.sync_engine.pool.overflow(),
+    },
 )
 
 AsyncSessionLocal = sessionmaker(
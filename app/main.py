@@ -1,14 +1,44 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, HTTPException, WebSocket
 from fastapi.openapi.utils import get_openapi
 from starlette.responses import JSONResponse
 
 from app.api.router import router
-from app.api.websocket import websocket_endpoint
+from app.api.websocket import message_writer, websocket_endpoint, websocket_manager
+from app.config import settings
+from app.database import engine
+from app.services.partition_service import MessagePartitionMaintainer
+from app.utils.profiler import profiler
+
+partition_maintainer = MessagePartitionMaintainer(
+    engine,
+    months_ahead=settings.MESSAGE_PARTITION_MONTHS_AHEAD,
+    retention_months=settings.MESSAGE_RETENTION_MONTHS,
+    interval=settings.MESSAGE_PARTITION_MAINTENANCE_INTERVAL,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if message_writer is not None:
+        await message_writer.start()
+    await websocket_manager.start()
+    await partition_maintainer.start()
+    yield
+    profiler.stop()
+    await partition_maintainer.stop()
+    await websocket_manager.stop()
+    # Сбрасываем накопленные сообщения до остановки процесса
+    if message_writer is not None:
+        await message_writer.stop()
+
 
 app = FastAPI(
     title="Chat API",
     description="Real-time chat application with WebSocket and REST API",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 
@@ -1,5 +1,5 @@
 # app/models/chat.py
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, Table
+from sqlalchemy import Column, DateTime, FetchedValue, ForeignKey, Index, Integer, Table
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -8,17 +8,21 @@ from app.database import Base
 chat_users = Table(
     "chat_users",
     Base.metadata,
-    Column("chat_id", Integer, ForeignKey("chats.id", ondelete="CASCADE")),
-    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE")),
+    Column("chat_id", Integer, ForeignKey("chats.id", ondelete="CASCADE"), primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+    Index("ix_chat_users_user_id_chat_id", "user_id", "chat_id"),
 )
 
 
 class Chat(Base):
     __tablename__ = "chats"
+    # Серверные значения по умолчанию возвращаются через INSERT ... RETURNING;
+    # updated_at без значения по умолчанию тоже читается оттуда (NULL до первого UPDATE)
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=FetchedValue(), onupdate=func.now())
 
     # Relationships
     participants = relationship("User", secondary=chat_users, back_populates="chats")
@@ -1,5 +1,5 @@
 # app/models/message.py
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -8,13 +8,21 @@ from app.database import Base
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_chat_id_timestamp_id", "chat_id", "timestamp", "id"),
+        # Помесячные секции создаются функцией create_message_partitions
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+    # Серверные значения по умолчанию возвращаются через INSERT ... RETURNING
+    __mapper_args__ = {"eager_defaults": True}
 
-    id = Column(Integer, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
     text = Column(String, nullable=False)
     chat_id = Column(Integer, ForeignKey("chats.id", ondelete="CASCADE"), nullable=False)
     sender_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     receiver_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Ключ секционирования входит в первичный ключ
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), primary_key=True)
 
     # Relationships
     chat = relationship("Chat", back_populates="messages")
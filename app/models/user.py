@@ -1,5 +1,5 @@
 # app/models/user.py
-from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy import Column, DateTime, FetchedValue, Integer, String
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -8,11 +8,14 @@ from app.database import Base
 
 class User(Base):
     __tablename__ = "users"
+    # Серверные значения по умолчанию возвращаются через INSERT ... RETURNING;
+    # updated_at без значения по умолчанию тоже читается оттуда (NULL до первого UPDATE)
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True)
     username = Column(String, unique=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=FetchedValue(), onupdate=func.now())
 
     # Relationships
     chats = relationship("Chat", secondary="chat_users", back_populates="participants")
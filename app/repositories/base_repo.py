@@ -15,7 +15,6 @@ class BaseRepository(Generic[ModelType]):
         instance = self.model(**kwargs)
         self.session.add(instance)
         await self.session.commit()
-        await self.session.refresh(instance)
         return instance
 
     async def get_by_id(self, id: int) -> Optional[ModelType]:
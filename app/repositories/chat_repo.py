@@ -1,14 +1,23 @@
 # app/repositories/chat_repo.py
-from typing import List, Optional
+from typing import FrozenSet, List, Optional
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.models.chat import Chat
+from app.config import settings
+from app.models.chat import Chat, chat_users
 from app.models.user import User
+from app.utils.cache import TTLCache
 
 from .base_repo import BaseRepository
+from .message_repo import history_cache
+
+# chat_id -> участники; общий для всех сессий процесса
+membership_cache: TTLCache[FrozenSet[int]] = TTLCache(
+    maxsize=settings.MEMBERSHIP_CACHE_SIZE,
+    ttl=settings.MEMBERSHIP_CACHE_TTL,
+)
 
 
 class ChatRepository(BaseRepository[Chat]):
@@ -30,7 +39,7 @@ class ChatRepository(BaseRepository[Chat]):
 
         self.session.add(chat)
         await self.session.commit()
-        await self.session.refresh(chat)
+        membership_cache.invalidate(chat.id)
         return chat
 
     async def get_chat_with_participants(self, chat_id: int) -> Optional[Chat]:
@@ -42,6 +51,26 @@ class ChatRepository(BaseRepository[Chat]):
         result = await self.session.execute(query)
         return result.scalar_one_or_none()
 
+    async def get_participant_ids(self, chat_id: int) -> Optional[FrozenSet[int]]:
+        """Participant ids of a chat, or None if the chat does not exist"""
+        participant_ids = membership_cache.get(chat_id)
+        if participant_ids is not None:
+            return participant_ids
+
+        query = (
+            select(self.model.id, chat_users.c.user_id)
+            .outerjoin(chat_users, chat_users.c.chat_id == self.model.id)
+            .filter(self.model.id == chat_id)
+        )
+        result = await self.session.execute(query)
+        rows = result.all()
+        if not rows:
+            return None
+
+        participant_ids = frozenset(user_id for _, user_id in rows if user_id is not None)
+        membership_cache.set(chat_id, participant_ids)
+        return participant_ids
+
     async def add_participant(self, chat_id: int, user_id: int) -> bool:
         chat = await self.get_chat_with_participants(chat_id)
         if not chat:
@@ -56,8 +85,16 @@ class ChatRepository(BaseRepository[Chat]):
 
         chat.participants.append(user)
         await self.session.commit()
+        membership_cache.invalidate(chat_id)
         return True
 
+    async def delete(self, id: int) -> bool:
+        deleted = await super().delete(id)
+        # Сообщения удаляются вместе с чатом каскадом
+        membership_cache.invalidate(id)
+        history_cache.invalidate(id)
+        return deleted
+
     async def remove_participant(self, chat_id: int, user_id: int) -> bool:
         chat = await self.get_chat_with_participants(chat_id)
         if not chat:
@@ -65,4 +102,5 @@ class ChatRepository(BaseRepository[Chat]):
 
         chat.participants = [p for p in chat.participants if p.id != user_id]
         await self.session.commit()
+        membership_cache.invalidate(chat_id)
         return True
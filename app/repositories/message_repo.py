@@ -1,10 +1,50 @@
 from datetime import UTC, datetime
-from typing import List
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import (
+    Row,
+    Select,
+    String,
+    Text,
+    case,
+    func,
+    insert,
+    literal_column,
+    select,
+    tuple_,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
 from app.models.message import Message
+from app.schemas.message_schema import Message as MessageSchema
+from app.utils.cache import ChatHistoryCache
+from app.utils.metrics import registry
+
+# Последние сообщения горячих чатов; общий для всех сессий процесса
+history_cache = ChatHistoryCache(
+    max_bytes=settings.HISTORY_CACHE_MAX_BYTES,
+    per_chat=settings.HISTORY_CACHE_MESSAGES_PER_CHAT,
+    ttl=settings.HISTORY_CACHE_TTL,
+)
+registry.stats("chat_history_cache", "History cache", history_cache.stats)
+
+# Страницы истории читаются столбцами: без ORM-объектов и identity map
+MESSAGE_COLUMNS = (
+    Message.id,
+    Message.text,
+    Message.chat_id,
+    Message.sender_id,
+    Message.receiver_id,
+    Message.timestamp,
+)
+
+
+def rows_to_schemas(rows: Sequence[Row]) -> List[MessageSchema]:
+    """Response models built straight from rows; database values need no validation"""
+    construct = MessageSchema.model_construct
+    return [construct(**row._mapping) for row in rows]
 
 
 class MessageRepository:
@@ -27,21 +67,182 @@ class MessageRepository:
         )
         self.session.add(message)
         await self.session.commit()
-        await self.session.refresh(message)
+        history_cache.append(chat_id, MessageSchema.model_validate(message))
         return message
 
+    async def create_messages(self, messages: List[dict]) -> List[Message]:
+        """Insert several messages with one INSERT ... RETURNING and commit.
+
+        Each dict holds chat_id, sender_id, receiver_id, text and optionally
+        timestamp; the result is in the same order as ``messages``.
+        """
+        if not messages:
+            return []
+
+        now = datetime.now(UTC)
+        rows = [{"timestamp": now} | values for values in messages]
+        query = insert(Message).returning(Message, sort_by_parameter_order=True)
+        result = await self.session.scalars(query, rows)
+        created = list(result.all())
+        await self.session.commit()
+        for message in created:
+            history_cache.append(message.chat_id, MessageSchema.model_validate(message))
+        return created
+
+    async def get_message_text(self, chat_id: int, message_id: int) -> Optional[str]:
+        """Text of one message of a chat"""
+        query = select(Message.text).filter(Message.chat_id == chat_id, Message.id == message_id)
+        result = await self.session.execute(query)
+        return result.scalar_one_or_none()
+
     async def get_chat_messages(
         self,
         chat_id: int,
         limit: int = 50,
         offset: int = 0,
-    ) -> List[Message]:
+    ) -> List[MessageSchema]:
+        query, _ = self._page_query(chat_id, limit, offset=offset)
+        result = await self.session.execute(query)
+        return rows_to_schemas(result.all())
+
+    async def get_chat_messages_by_cursor(
+        self,
+        chat_id: int,
+        limit: int = 50,
+        before: Optional[Tuple[datetime, int]] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        latest: bool = False,
+    ) -> List[MessageSchema]:
+        """Keyset page of chat messages in ascending order.
+
+        ``after`` returns the messages following the given (timestamp, id)
+        position, ``before`` the messages preceding it and ``latest`` the
+        newest messages of the chat. The cost of a page does not depend on
+        how deep into the history it is. The extra plain comparisons on
+        ``timestamp`` let Postgres prune the monthly partitions outside the
+        page's range.
+        """
+        query, descending = self._page_query(chat_id, limit, before=before, after=after, latest=latest)
+        result = await self.session.execute(query)
+        rows = result.all()
+        return rows_to_schemas(rows[::-1] if descending else rows)
+
+    async def get_chat_messages_json(
+        self,
+        chat_id: int,
+        limit: int = 50,
+        offset: int = 0,
+        before: Optional[Tuple[datetime, int]] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        latest: bool = False,
+    ) -> Tuple[str, int, Optional[Tuple[datetime, int]]]:
+        """A history page rendered by Postgres as one ``json_agg`` document.
+
+        Takes the same arguments as the offset and cursor reads and returns
+        the JSON array of messages in ascending order, the number of
+        messages and the (timestamp, id) position ``next_cursor`` is built
+        from: the oldest message for ``before``/``latest`` pages, the newest
+        otherwise. Objects have the keys and timestamp format of the
+        ``Message`` schema.
+        """
+        query, descending = self._page_query(chat_id, limit, offset, before, after, latest)
+        page = query.subquery()
+
+        utc = func.timezone("UTC", page.c.timestamp)
+        microseconds = func.to_char(utc, "US", type_=String)
+        timestamp = (
+            func.to_char(utc, 'YYYY-MM-DD"T"HH24:MI:SS', type_=String)
+            + case((microseconds == "000000", ""), else_="." + microseconds)
+            + "Z"
+        )
+        message = func.json_build_object(
+            literal_column("'text'"), page.c.text,
+            literal_column("'id'"), page.c.id,
+            literal_column("'chat_id'"), page.c.chat_id,
+            literal_column("'sender_id'"), page.c.sender_id,
+            literal_column("'receiver_id'"), page.c.receiver_id,
+            literal_column("'timestamp'"), timestamp,
+        )
+
+        if descending:
+            edge_order = (page.c.timestamp.asc(), page.c.id.asc())
+        else:
+            edge_order = (page.c.timestamp.desc(), page.c.id.desc())
+
+        result = await self.session.execute(
+            select(
+                func.coalesce(
+                    func.json_agg(aggregate_order_by(message, page.c.timestamp, page.c.id)),
+                    literal_column("'[]'::json"),
+                ).cast(Text),
+                func.count(),
+                func.array_agg(aggregate_order_by(page.c.timestamp, *edge_order))[1],
+                func.array_agg(aggregate_order_by(page.c.id, *edge_order))[1],
+            ),
+        )
+        document, count, edge_timestamp, edge_id = result.one()
+        return document, count, (edge_timestamp, edge_id) if count else None
+
+    def _page_query(
+        self,
+        chat_id: int,
+        limit: int,
+        offset: int = 0,
+        before: Optional[Tuple[datetime, int]] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        latest: bool = False,
+    ) -> Tuple[Select, bool]:
+        """Page query and whether it reads newest first (to be reversed)"""
+        position = tuple_(Message.timestamp, Message.id)
+        query = select(*MESSAGE_COLUMNS).filter(Message.chat_id == chat_id)
+
+        if before is not None or latest:
+            if before is not None:
+                query = query.filter(
+                    Message.timestamp <= before[0],
+                    position < tuple_(*before),
+                )
+            query = (
+                query.order_by(Message.timestamp.desc(), Message.id.desc())
+                .limit(limit)
+            )
+            return query, True
+
+        if after is not None:
+            query = query.filter(
+                Message.timestamp >= after[0],
+                position > tuple_(*after),
+            )
+        elif offset:
+            query = query.offset(offset)
+
+        query = query.order_by(Message.timestamp.asc(), Message.id.asc()).limit(limit)
+        return query, False
+
+    async def stream_chat_messages(
+        self,
+        chat_id: int,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """All messages of a chat in ascending order, ``batch_size`` rows at a time.
+
+        Uses a server-side cursor and plain rows, so memory does not grow
+        with the size of the chat. The next batch is fetched only when the
+        consumer asks for it.
+        """
         query = (
-            select(Message)
+            select(
+                Message.id,
+                Message.chat_id,
+                Message.sender_id,
+                Message.receiver_id,
+                Message.text,
+                Message.timestamp,
+            )
             .filter(Message.chat_id == chat_id)
-            .order_by(Message.timestamp.asc())
-            .limit(limit)
-            .offset(offset)
+            .order_by(Message.timestamp.asc(), Message.id.asc())
+            .execution_options(yield_per=batch_size)
         )
-        result = await self.session.execute(query)
-        return list(result.scalars().all())
+        result = await self.session.stream(query)
+        async for partition in result.partitions():
+            yield partition
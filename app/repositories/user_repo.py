@@ -1,12 +1,19 @@
 from typing import List, Optional
 
-from sqlalchemy import select
+from sqlalchemy import select, true
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.models.chat import chat_users
+from app.models.message import Message
 from app.models.user import User
+from app.schemas.chat_schema import UserChat
+from app.schemas.message_schema import Message as MessageSchema
 
 from .base_repo import BaseRepository
+from .message_repo import MESSAGE_COLUMNS
+
+LAST_MESSAGE_FIELDS = tuple(column.key for column in MESSAGE_COLUMNS)
 
 
 class UserRepository(BaseRepository[User]):
@@ -27,3 +34,46 @@ class UserRepository(BaseRepository[User]):
         result = await self.session.execute(query)
         user = result.scalar_one_or_none()
         return user.chats if user else []
+
+    async def get_user_chat_summaries(
+        self,
+        user_id: int,
+        with_last_message: bool = False,
+    ) -> Optional[List[UserChat]]:
+        """Chats of a user in one query, or None if the user does not exist.
+
+        Reads only ``chat_users`` (by the user_id index) instead of loading
+        the user and its ``Chat`` objects. ``with_last_message`` adds the
+        newest message of every chat through a LATERAL top-1 on the
+        (chat_id, timestamp, id) index.
+        """
+        query = (
+            select(self.model.id, chat_users.c.chat_id)
+            .outerjoin(chat_users, chat_users.c.user_id == self.model.id)
+            .filter(self.model.id == user_id)
+            .order_by(chat_users.c.chat_id)
+        )
+        if with_last_message:
+            last_message = (
+                select(*MESSAGE_COLUMNS)
+                .filter(Message.chat_id == chat_users.c.chat_id)
+                .order_by(Message.timestamp.desc(), Message.id.desc())
+                .limit(1)
+                .lateral("last_message")
+            )
+            query = query.add_columns(*last_message.c).outerjoin(last_message, true())
+
+        result = await self.session.execute(query)
+        rows = result.all()
+        if not rows:
+            return None
+
+        chats = []
+        for _, chat_id, *message in rows:
+            if chat_id is None:
+                continue
+            last = None
+            if message and message[0] is not None:
+                last = MessageSchema.model_construct(**dict(zip(LAST_MESSAGE_FIELDS, message)))
+            chats.append(UserChat.model_construct(chat_id=chat_id, last_message=last))
+        return chats
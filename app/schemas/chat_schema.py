@@ -4,6 +4,7 @@ from typing import List, Optional
 
 from pydantic import BaseModel, ConfigDict
 
+from .message_schema import Message
 from .user_schema import User
 
 
@@ -31,3 +32,10 @@ class Chat(ChatInDB):
     """Схема для ответа API"""
 
     participants: List[User]
+
+
+class UserChat(BaseModel):
+    """Чат пользователя при подключении: id и, по запросу, последнее сообщение"""
+
+    chat_id: int
+    last_message: Optional[Message] = None
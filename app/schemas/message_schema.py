@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel
 
@@ -26,3 +26,4 @@ class Message(MessageBase):
 
 class MessageList(BaseModel):
     messages: List[Message]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,311 @@
+# app/services/broadcast.py
+"""Broadcast backends that carry chat frames between worker processes.
+
+Each worker subscribes only to the chats its connected users belong to,
+so frames for other chats are never delivered to (or parsed by) it.
+"""
+import asyncio
+from typing import Callable, Optional, Set
+
+from sqlalchemy import text
+
+from app.utils.logger import logger
+
+MessageHandler = Callable[[int, str], None]
+
+
+class BroadcastBackend:
+    """In-process backend: delivers published frames to this worker only"""
+
+    # Локальный backend позволяет доставлять готовый кадр без сериализации
+    is_local = True
+    # Предел размера сообщения; None - без ограничения
+    MAX_PAYLOAD_BYTES: Optional[int] = None
+    # Пауза перед повторным подключением, удваивается до максимума
+    RECONNECT_DELAY = 0.5
+    RECONNECT_MAX_DELAY = 30.0
+
+    def __init__(self):
+        self._handler: Optional[MessageHandler] = None
+        self._subscribed: Set[int] = set()
+
+    async def start(self, handler: MessageHandler):
+        self._handler = handler
+
+    async def stop(self):
+        self._handler = None
+        self._subscribed.clear()
+
+    async def subscribe(self, chat_id: int):
+        self._subscribed.add(chat_id)
+
+    async def unsubscribe(self, chat_id: int):
+        self._subscribed.discard(chat_id)
+
+    async def publish(self, chat_id: int, data: str):
+        if self._handler is not None:
+            self._handler(chat_id, data)
+
+
+class PostgresBroadcastBackend(BroadcastBackend):
+    """LISTEN/NOTIFY over the application's asyncpg engine.
+
+    One pooled connection is held for LISTEN; notifications are published
+    through regular pooled connections. Postgres limits a NOTIFY payload
+    to 8000 bytes: ``WebSocketManager`` publishes larger frames as a
+    reference to the stored message, anything else is dropped with an error.
+    A lost LISTEN connection is re-established with exponential backoff and
+    every subscribed channel is listened again; notifications sent in
+    between are lost.
+    """
+
+    is_local = False
+    CHANNEL_PREFIX = "chat_"
+    MAX_PAYLOAD_BYTES = 7999
+
+    def __init__(self, engine):
+        super().__init__()
+        self._engine = engine
+        self._connection = None
+        self._listener = None
+        self._reconnector: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def start(self, handler: MessageHandler):
+        await super().start(handler)
+        async with self._lock:
+            await self._listen()
+
+    async def stop(self):
+        if self._reconnector is not None:
+            self._reconnector.cancel()
+            self._reconnector = None
+        async with self._lock:
+            await self._close()
+        await super().stop()
+
+    async def subscribe(self, chat_id: int):
+        async with self._lock:
+            if chat_id in self._subscribed:
+                return
+            # Пока соединение восстанавливается, канал запоминается и слушается после
+            self._subscribed.add(chat_id)
+            if self._listener is None:
+                return
+            try:
+                await self._listener.add_listener(self._channel(chat_id), self._on_notify)
+            except Exception as e:
+                # Разорванное соединение переподключится и подпишется на канал заново
+                logger.error("LISTEN on chat %s failed: %r", chat_id, e)
+
+    async def unsubscribe(self, chat_id: int):
+        async with self._lock:
+            if chat_id not in self._subscribed:
+                return
+            self._subscribed.discard(chat_id)
+            if self._listener is not None:
+                await self._listener.remove_listener(self._channel(chat_id), self._on_notify)
+
+    async def publish(self, chat_id: int, data: str):
+        if len(data.encode()) > self.MAX_PAYLOAD_BYTES:
+            logger.error("Broadcast frame for chat %s exceeds NOTIFY payload limit", chat_id)
+            return
+        async with self._engine.connect() as conn:
+            await conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": self._channel(chat_id), "payload": data},
+            )
+            await conn.commit()
+
+    def _channel(self, chat_id: int) -> str:
+        return f"{self.CHANNEL_PREFIX}{chat_id}"
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str):
+        if self._handler is not None:
+            self._handler(int(channel.removeprefix(self.CHANNEL_PREFIX)), payload)
+
+    async def _listen(self):
+        """Take a connection from the pool and LISTEN on every subscribed channel"""
+        connection = await self._engine.connect()
+        try:
+            raw_connection = await connection.get_raw_connection()
+            listener = raw_connection.driver_connection
+            for chat_id in self._subscribed:
+                await listener.add_listener(self._channel(chat_id), self._on_notify)
+        except BaseException:
+            await connection.invalidate()
+            raise
+        listener.add_termination_listener(self._on_terminate)
+        self._connection = connection
+        self._listener = listener
+
+    async def _close(self):
+        listener, self._listener = self._listener, None
+        connection, self._connection = self._connection, None
+        if listener is not None:
+            listener.remove_termination_listener(self._on_terminate)
+        if connection is None:
+            return
+        # Соединение с подписками LISTEN не возвращается в пул
+        try:
+            await connection.invalidate()
+        except Exception as e:
+            logger.warning("Closing the broadcast LISTEN connection failed: %r", e)
+
+    def _on_terminate(self, connection):
+        if connection is not self._listener or self._handler is None:
+            return
+        logger.error("Broadcast LISTEN connection lost, reconnecting")
+        self._listener = None
+        self._reconnector = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self):
+        delay = self.RECONNECT_DELAY
+        async with self._lock:
+            await self._close()
+            while self._listener is None:
+                try:
+                    await self._listen()
+                except Exception as e:
+                    logger.error("Broadcast LISTEN reconnect failed, retrying in %.1fs: %r", delay, e)
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.RECONNECT_MAX_DELAY)
+        self._reconnector = None
+        # Уведомления, пришедшие во время разрыва, потеряны
+        logger.warning("Broadcast LISTEN connection restored, %s channels", len(self._subscribed))
+
+
+class RedisBroadcastBackend(BroadcastBackend):
+    """Redis pub/sub, one channel per chat.
+
+    Accepts any ``redis.asyncio.Redis`` compatible client, so a local
+    stand-in such as ``fakeredis.aioredis.FakeRedis`` can be passed in.
+    When reading fails, the pub/sub connection is replaced with exponential
+    backoff and every subscribed channel is subscribed again.
+    """
+
+    is_local = False
+    CHANNEL_PREFIX = "chat:"
+
+    def __init__(self, client):
+        super().__init__()
+        self._client = client
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBroadcastBackend":
+        try:
+            from redis import asyncio as redis
+        except ImportError as e:
+            msg = "BROADCAST_BACKEND=redis requires the 'redis' package"
+            raise RuntimeError(msg) from e
+        return cls(redis.from_url(url))
+
+    async def start(self, handler: MessageHandler):
+        await super().start(handler)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._reader = asyncio.get_running_loop().create_task(self._read())
+
+    async def stop(self):
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        await super().stop()
+
+    async def subscribe(self, chat_id: int):
+        async with self._lock:
+            if chat_id in self._subscribed or self._pubsub is None:
+                return
+            self._subscribed.add(chat_id)
+            try:
+                await self._pubsub.subscribe(self._channel(chat_id))
+            except Exception as e:
+                # Канал подпишется заново вместе с остальными после переподключения
+                logger.error("Redis subscribe to chat %s failed: %r", chat_id, e)
+
+    async def unsubscribe(self, chat_id: int):
+        async with self._lock:
+            if chat_id not in self._subscribed or self._pubsub is None:
+                return
+            self._subscribed.discard(chat_id)
+            try:
+                await self._pubsub.unsubscribe(self._channel(chat_id))
+            except Exception as e:
+                logger.error("Redis unsubscribe from chat %s failed: %r", chat_id, e)
+
+    async def publish(self, chat_id: int, data: str):
+        await self._client.publish(self._channel(chat_id), data)
+
+    def _channel(self, chat_id: int) -> str:
+        return f"{self.CHANNEL_PREFIX}{chat_id}"
+
+    async def _read(self):
+        while True:
+            if not self._subscribed:
+                await asyncio.sleep(0.1)
+                continue
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Redis broadcast read failed, reconnecting: %r", e)
+                await self._reconnect()
+                continue
+            if message is None or message.get("type") != "message":
+                continue
+
+            channel = message["channel"]
+            data = message["data"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            if isinstance(data, bytes):
+                data = data.decode()
+            if self._handler is not None:
+                self._handler(int(channel.removeprefix(self.CHANNEL_PREFIX)), data)
+
+    async def _reconnect(self):
+        delay = self.RECONNECT_DELAY
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await self._resubscribe()
+            except Exception as e:
+                delay = min(delay * 2, self.RECONNECT_MAX_DELAY)
+                logger.error("Redis broadcast reconnect failed, retrying in %.1fs: %r", delay, e)
+                continue
+            # Сообщения, опубликованные во время разрыва, потеряны
+            logger.warning("Redis broadcast connection restored, %s channels", len(self._subscribed))
+            return
+
+    async def _resubscribe(self):
+        """Replace the pub/sub connection and subscribe to every channel again"""
+        async with self._lock:
+            pubsub, self._pubsub = self._pubsub, self._client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.aclose()
+            except Exception as e:
+                logger.warning("Closing the Redis pub/sub connection failed: %r", e)
+            if self._subscribed:
+                await self._pubsub.subscribe(*(self._channel(chat_id) for chat_id in self._subscribed))
+
+
+def create_broadcast_backend(name: str, redis_url: Optional[str] = None) -> BroadcastBackend:
+    if name == "memory":
+        return BroadcastBackend()
+    if name == "postgres":
+        from app.database import engine
+
+        return PostgresBroadcastBackend(engine)
+    if name == "redis":
+        if not redis_url:
+            msg = "BROADCAST_BACKEND=redis requires REDIS_URL"
+            raise ValueError(msg)
+        return RedisBroadcastBackend.from_url(redis_url)
+    msg = f"Unknown broadcast backend: {name}"
+    raise ValueError(msg)
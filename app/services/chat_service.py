@@ -1,12 +1,12 @@
 # app/services/chat_service.py
-from typing import List, Optional
+from typing import FrozenSet, List, Optional
 
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.repositories.chat_repo import ChatRepository
 from app.repositories.user_repo import UserRepository
-from app.schemas.chat_schema import Chat, ChatCreate
+from app.schemas.chat_schema import Chat, ChatCreate, UserChat
 
 
 class ChatService:
@@ -41,9 +41,27 @@ class ChatService:
             raise HTTPException(status_code=404, detail="Chat not found")
         return chat
 
+    async def get_participant_ids(self, chat_id: int) -> FrozenSet[int]:
+        """Получение участников чата (из кэша, если есть)"""
+        participant_ids = await self.chat_repo.get_participant_ids(chat_id)
+        if participant_ids is None:
+            raise HTTPException(status_code=404, detail="Chat not found")
+        return participant_ids
+
     async def get_user_chats(self, user_id: int) -> List[Chat]:
         """Получение всех чатов пользователя"""
         user = await self.user_repo.get_by_id(user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         return await self.user_repo.get_user_chats(user_id)
+
+    async def get_user_chat_summaries(
+        self,
+        user_id: int,
+        with_last_message: bool = False,
+    ) -> List[UserChat]:
+        """Чаты пользователя одним запросом (id и, по запросу, последнее сообщение)"""
+        chats = await self.user_repo.get_user_chat_summaries(user_id, with_last_message)
+        if chats is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        return chats
@@ -1,16 +1,44 @@
 # app/services/message_service.py
+import csv
+import hashlib
+import io
+import json
+from datetime import UTC, datetime
+from typing import AsyncIterator, List, Optional, Tuple, Union
 
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.repositories.chat_repo import ChatRepository
-from app.repositories.message_repo import MessageRepository
+from app.repositories.message_repo import MessageRepository, history_cache
 from app.schemas.message_schema import Message, MessageCreate, MessageList
+from app.services.message_writer import MessageBatchWriter
+from app.utils.cursor import decode_cursor, encode_cursor
+
+
+def history_etag(page: Union[MessageList, str]) -> str:
+    """ETag of a history page.
+
+    A page rendered by Postgres is hashed as is; a ``MessageList`` by the
+    message ids and ``next_cursor`` it serializes from, since messages are
+    never edited. The ETag always matches the body that is sent, whichever
+    cache or query produced it.
+    """
+    if isinstance(page, MessageList):
+        page = f"{page.next_cursor}:{','.join(str(message.id) for message in page.messages)}"
+    digest = hashlib.blake2b(page.encode(), digest_size=12)
+    return f'"{digest.hexdigest()}"'
+
+
+def format_timestamp(timestamp: datetime) -> str:
+    """Timestamp as the history API writes it: UTC with ``Z``"""
+    return timestamp.astimezone(UTC).isoformat().replace("+00:00", "Z")
 
 
 class MessageService:
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, writer: Optional[MessageBatchWriter] = None):
         self.session = session
+        self.writer = writer
         self.message_repo = MessageRepository(session)
         self.chat_repo = ChatRepository(session)
 
@@ -20,48 +48,230 @@ class MessageService:
         sender_id: int,
     ) -> Message:
         """Создание нового сообщения"""
+        await self._check_participants(message_data, sender_id)
+
+        if self.writer is not None:
+            return await self.writer.submit(
+                chat_id=message_data.chat_id,
+                sender_id=sender_id,
+                receiver_id=message_data.receiver_id,
+                text=message_data.text,
+            )
+
+        return await self.message_repo.create_message(
+            chat_id=message_data.chat_id,
+            sender_id=sender_id,
+            receiver_id=message_data.receiver_id,
+            text=message_data.text,
+        )
+
+    async def create_messages(
+        self,
+        messages: List[MessageCreate],
+        sender_id: int,
+    ) -> List[Message]:
+        """Создание пачки сообщений одним запросом и одной транзакцией"""
+        for message_data in messages:
+            await self._check_participants(message_data, sender_id)
+
+        return await self.message_repo.create_messages([
+            {
+                "chat_id": message_data.chat_id,
+                "sender_id": sender_id,
+                "receiver_id": message_data.receiver_id,
+                "text": message_data.text,
+            }
+            for message_data in messages
+        ])
+
+    async def _check_participants(self, message_data: MessageCreate, sender_id: int):
         # Проверяем существование чата
-        chat = await self.chat_repo.get_chat_with_participants(message_data.chat_id)
-        if not chat:
+        participant_ids = await self.chat_repo.get_participant_ids(message_data.chat_id)
+        if participant_ids is None:
             raise HTTPException(status_code=404, detail="Chat not found")
 
         # Проверяем, что отправитель является участником чата
-        if sender_id not in [p.id for p in chat.participants]:
+        if sender_id not in participant_ids:
             raise HTTPException(
                 status_code=403,
                 detail="Sender is not a participant of this chat",
             )
 
         # Проверяем, что получатель является участником чата
-        if message_data.receiver_id not in [p.id for p in chat.participants]:
+        if message_data.receiver_id not in participant_ids:
             raise HTTPException(
                 status_code=403,
                 detail="Receiver is not a participant of this chat",
             )
 
-        return await self.message_repo.create_message(
-            chat_id=message_data.chat_id,
-            sender_id=sender_id,
-            receiver_id=message_data.receiver_id,
-            text=message_data.text,
-        )
-
     async def get_chat_history(
         self,
         chat_id: int,
         limit: int = 50,
         offset: int = 0,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        latest: bool = False,
     ) -> MessageList:
         """Получение истории сообщений чата"""
-        # Проверяем существование чата
-        chat = await self.chat_repo.get_by_id(chat_id)
-        if not chat:
-            raise HTTPException(status_code=404, detail="Chat not found")
+        before_key, after_key = self._parse_cursors(before, after, latest)
+
+        messages = self._get_cached_page(chat_id, limit, offset, before_key, after_key, latest)
+        if messages is None:
+            messages = await self._get_page(chat_id, limit, offset, before_key, after_key, latest)
+
+            # Существование чата проверяем, только если страница пуста
+            if not messages and not await self.chat_repo.get_by_id(chat_id):
+                raise HTTPException(status_code=404, detail="Chat not found")
+
+        # Курсор следующей страницы в том же направлении
+        next_cursor = None
+        if len(messages) == limit:
+            edge = messages[0] if before is not None or latest else messages[-1]
+            next_cursor = encode_cursor(edge.timestamp, edge.id)
+
+        return MessageList(messages=messages, next_cursor=next_cursor)
 
-        messages = await self.message_repo.get_chat_messages(
+    async def get_chat_history_json(
+        self,
+        chat_id: int,
+        limit: int = 50,
+        offset: int = 0,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        latest: bool = False,
+    ) -> str:
+        """Страница истории в JSON ``MessageList``, собранная на стороне Postgres"""
+        before_key, after_key = self._parse_cursors(before, after, latest)
+
+        document, count, edge = await self.message_repo.get_chat_messages_json(
             chat_id=chat_id,
             limit=limit,
             offset=offset,
+            before=before_key,
+            after=after_key,
+            latest=latest,
+        )
+        if not count and not await self.chat_repo.get_by_id(chat_id):
+            raise HTTPException(status_code=404, detail="Chat not found")
+
+        next_cursor = encode_cursor(*edge) if count == limit else None
+        return f'{{"messages":{document},"next_cursor":{json.dumps(next_cursor)}}}'
+
+    def _parse_cursors(
+        self,
+        before: Optional[str],
+        after: Optional[str],
+        latest: bool,
+    ) -> Tuple[Optional[Tuple[datetime, int]], Optional[Tuple[datetime, int]]]:
+        if sum([before is not None, after is not None, latest]) > 1:
+            raise HTTPException(
+                status_code=400,
+                detail="Only one of 'before', 'after' and 'latest' can be set",
+            )
+
+        try:
+            before_key = decode_cursor(before) if before is not None else None
+            after_key = decode_cursor(after) if after is not None else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+        return before_key, after_key
+
+    async def check_chat_exists(self, chat_id: int):
+        """Проверка существования чата"""
+        if not await self.chat_repo.get_by_id(chat_id):
+            raise HTTPException(status_code=404, detail="Chat not found")
+
+    async def export_chat_history(
+        self,
+        chat_id: int,
+        export_format: str = "ndjson",
+        chunk_rows: int = 1000,
+    ) -> AsyncIterator[str]:
+        """Вся история чата в NDJSON или CSV, по ``chunk_rows`` строк за раз; время - как в API"""
+        columns = ["id", "chat_id", "sender_id", "receiver_id", "text", "timestamp"]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        if export_format == "csv":
+            writer.writerow(columns)
+            yield buffer.getvalue()
+
+        async for rows in self.message_repo.stream_chat_messages(chat_id, chunk_rows):
+            buffer.seek(0)
+            buffer.truncate()
+            for row in rows:
+                values = [*row[:-1], format_timestamp(row.timestamp)]
+                if export_format == "csv":
+                    writer.writerow(values)
+                else:
+                    buffer.write(json.dumps(dict(zip(columns, values)), ensure_ascii=False))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+
+    async def _get_page(
+        self,
+        chat_id: int,
+        limit: int,
+        offset: int,
+        before: Optional[Tuple[datetime, int]],
+        after: Optional[Tuple[datetime, int]],
+        latest: bool,
+    ) -> List[Message]:
+        if latest and history_cache.enabled:
+            # Читаем сразу окно кэша, чтобы следующие запросы попали в него
+            fetch = max(limit, history_cache.per_chat)
+            messages = await self.message_repo.get_chat_messages_by_cursor(
+                chat_id=chat_id,
+                limit=fetch,
+                latest=True,
+            )
+            if messages:
+                history_cache.put(chat_id, messages, complete=len(messages) < fetch)
+            return messages[-limit:]
+
+        if before is None and after is None and not latest:
+            return await self.message_repo.get_chat_messages(
+                chat_id=chat_id,
+                limit=limit,
+                offset=offset,
+            )
+
+        return await self.message_repo.get_chat_messages_by_cursor(
+            chat_id=chat_id,
+            limit=limit,
+            before=before,
+            after=after,
+            latest=latest,
         )
 
-        return MessageList(messages=messages)
+    def _get_cached_page(
+        self,
+        chat_id: int,
+        limit: int,
+        offset: int,
+        before: Optional[Tuple[datetime, int]],
+        after: Optional[Tuple[datetime, int]],
+        latest: bool,
+    ) -> Optional[List[Message]]:
+        """Page served from the history cache, or None if it is not covered"""
+        entry = history_cache.get(chat_id)
+        page = None
+        if entry is not None:
+            cached = entry.messages
+            if latest:
+                if entry.complete or len(cached) >= limit:
+                    page = cached[-limit:]
+            elif after is not None:
+                if entry.complete or (cached and (cached[0].timestamp, cached[0].id) <= after):
+                    page = [m for m in cached if (m.timestamp, m.id) > after][:limit]
+            elif before is not None:
+                older = [m for m in cached if (m.timestamp, m.id) < before]
+                if len(older) >= limit or entry.complete:
+                    page = older[-limit:]
+            elif entry.complete:
+                page = cached[offset:offset + limit]
+
+        if history_cache.enabled:
+            history_cache.record(hit=page is not None)
+        return page
@@ -0,0 +1,100 @@
+# app/services/message_writer.py
+import asyncio
+from datetime import UTC, datetime
+from typing import List, Optional, Tuple
+
+from app.repositories.message_repo import MessageRepository
+from app.schemas.message_schema import Message
+from app.utils.logger import logger
+
+PendingMessage = Tuple[dict, asyncio.Future]
+
+
+class MessageBatchWriter:
+    """Write-behind persistence of chat messages in micro-batches.
+
+    Messages submitted within ``max_delay`` seconds (at most ``max_batch``
+    of them) are stored with one multi-row ``INSERT ... RETURNING`` in a
+    single transaction. Each caller awaits its own future and gets the
+    stored message with its id. ``stop`` flushes everything still queued.
+    """
+
+    def __init__(self, session_factory, max_batch: int = 100, max_delay: float = 0.005):
+        self._session_factory = session_factory
+        self._max_batch = max_batch
+        self._max_delay = max_delay
+        self._queue: asyncio.Queue[Optional[PendingMessage]] = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+        self._closed = False
+
+    async def start(self):
+        self._closed = False
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._closed = True
+        self._queue.put_nowait(None)
+        await self._worker
+        self._worker = None
+
+    async def submit(
+        self,
+        chat_id: int,
+        sender_id: int,
+        receiver_id: int,
+        text: str,
+    ) -> Message:
+        if self._closed or self._worker is None:
+            msg = "Message writer is not running"
+            raise RuntimeError(msg)
+
+        values = {
+            "chat_id": chat_id,
+            "sender_id": sender_id,
+            "receiver_id": receiver_id,
+            "text": text,
+            "timestamp": datetime.now(UTC),
+        }
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((values, future))
+        return await future
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+
+            # Даём пачке набраться, если очередь ещё не заполнила её
+            if self._max_delay > 0 and self._queue.qsize() + 1 < self._max_batch:
+                await asyncio.sleep(self._max_delay)
+
+            batch = [item]
+            while len(batch) < self._max_batch and not self._queue.empty():
+                next_item = self._queue.get_nowait()
+                if next_item is None:
+                    stopping = True
+                    break
+                batch.append(next_item)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[PendingMessage]):
+        try:
+            async with self._session_factory() as session:
+                stored = await MessageRepository(session).create_messages(
+                    [values for values, _ in batch],
+                )
+        except Exception as e:
+            logger.error("Failed to persist %d messages: %r", len(batch), e)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), message in zip(batch, stored):
+            if not future.done():
+                future.set_result(Message.model_validate(message))
@@ -0,0 +1,120 @@
+# app/services/partition_service.py
+import asyncio
+from datetime import UTC, datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.utils.logger import logger
+
+
+class MessagePartitionMaintainer:
+    """Keeps the monthly partitions of ``messages`` ahead of the clock.
+
+    Every ``interval`` seconds it creates the partitions for the next
+    ``months_ahead`` months and, if ``retention_months`` is set, drops the
+    partitions that ended before the retention window. Dropping a partition
+    is a catalog operation: no mass DELETE, no table bloat, no vacuum debt.
+    Expired partitions are detached concurrently first, so retention does
+    not block reads and writes of ``messages``. Any number of workers may
+    run it at once.
+    """
+
+    RETENTION_LOCK = "drop_message_partitions"
+
+    def __init__(
+            self,
+            engine: AsyncEngine,
+            months_ahead: int = 3,
+            retention_months: int = 0,
+            interval: float = 6 * 3600,
+    ):
+        self._engine = engine
+        self._months_ahead = months_ahead
+        self._retention_months = retention_months
+        self._interval = interval
+        self._worker: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    def retention_cutoff(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        """Start of the oldest month to keep, or None if retention is off"""
+        if self._retention_months <= 0:
+            return None
+        now = now or datetime.now(UTC)
+        months = now.year * 12 + now.month - 1 - self._retention_months
+        return datetime(months // 12, months % 12 + 1, 1, tzinfo=UTC)
+
+    async def run_once(self) -> Tuple[int, int]:
+        """Create missing partitions and apply retention; returns (created, dropped)"""
+        async with self._engine.begin() as conn:
+            created = await conn.scalar(
+                text("SELECT create_message_partitions(now(), :months_ahead)"),
+                {"months_ahead": self._months_ahead},
+            )
+        dropped = 0
+        cutoff = self.retention_cutoff()
+        if cutoff is not None:
+            dropped = await self.drop_partitions(cutoff)
+
+        if created or dropped:
+            logger.info(
+                "Message partitions: %s created, %s dropped",
+                created,
+                dropped,
+            )
+        return created, dropped
+
+    async def drop_partitions(self, older_than: datetime) -> int:
+        """Detach and drop the partitions that ended by ``older_than``; returns how many.
+
+        Returns 0 without waiting if another worker is applying retention.
+        """
+        async with self._engine.connect() as conn:
+            # DETACH ... CONCURRENTLY нельзя выполнять внутри транзакции
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            locked = await conn.scalar(
+                text("SELECT pg_try_advisory_lock(hashtext(:lock))"),
+                {"lock": self.RETENTION_LOCK},
+            )
+            if not locked:
+                return 0
+
+            try:
+                result = await conn.execute(
+                    text("SELECT partition_name, detach_pending FROM expired_message_partitions(:older_than)"),
+                    {"older_than": older_than},
+                )
+                expired = result.all()
+                quote = conn.dialect.identifier_preparer.quote
+                for name, detach_pending in expired:
+                    # Прерванный DETACH ... CONCURRENTLY завершается через FINALIZE
+                    mode = "FINALIZE" if detach_pending else "CONCURRENTLY"
+                    await conn.execute(text(f"ALTER TABLE messages DETACH PARTITION {quote(name)} {mode}"))
+                    await conn.execute(text(f"DROP TABLE {quote(name)}"))
+            finally:
+                await conn.execute(
+                    text("SELECT pg_advisory_unlock(hashtext(:lock))"),
+                    {"lock": self.RETENTION_LOCK},
+                )
+        return len(expired)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Message partition maintenance failed")
+            await asyncio.sleep(self._interval)
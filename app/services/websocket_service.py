@@ -1,57 +1,387 @@
+import asyncio
+import uuid
+from collections import deque
 from datetime import UTC, datetime
-from typing import Dict, Optional, Set
+from enum import Enum
+from typing import Callable, Deque, Dict, Hashable, Optional, Set, Tuple, Union
 
 from fastapi import WebSocket
+from starlette.websockets import WebSocketDisconnect
 
-from app.schemas.websocket_schema import WebSocketMessage, WebSocketResponse
+from app.repositories.message_repo import MessageRepository
+from app.schemas.websocket_schema import WebSocketMessage
+from app.services.broadcast import BroadcastBackend
+from app.utils.codec import EncodedFrame, FrameCodec
+from app.utils.logger import logger
+from app.utils.metrics import broadcast_fanout
+
+SEND_ERRORS = (TimeoutError, WebSocketDisconnect, RuntimeError, OSError)
+
+
+class OverflowPolicy(str, Enum):
+    """What to do when a client's outbound queue is full"""
+
+    DROP_OLDEST = "drop_oldest"
+    COALESCE = "coalesce"
+    DISCONNECT = "disconnect"
+
+
+class Connection:
+    """A client socket with its own bounded outbound queue and writer task.
+
+    Senders only enqueue, so a slow reader never blocks the coroutine that
+    produced the frame. Frames enqueued with a ``key`` can be coalesced:
+    on overflow a queued frame with the same key is replaced by the new one.
+    Frames of at least ``binary_threshold`` bytes go out as binary frames
+    (0 disables this), reusing the shared UTF-8 buffer as is. A flushing
+    ``close`` sends what is still queued before closing the socket.
+    """
+
+    def __init__(
+            self,
+            websocket: WebSocket,
+            user_id: int,
+            max_queue: int,
+            policy: OverflowPolicy,
+            send_timeout: float,
+            on_failure: Callable[["Connection"], None],
+            binary_threshold: int = 0,
+    ):
+        self.websocket = websocket
+        self.user_id = user_id
+        self._max_queue = max_queue
+        self._policy = policy
+        self._send_timeout = send_timeout
+        self._on_failure = on_failure
+        self._binary_threshold = binary_threshold
+        self._queue: Deque[Tuple[Optional[Hashable], EncodedFrame]] = deque()
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self._draining = False
+
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def start(self):
+        self._writer = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        self._queue.clear()
+
+    def enqueue(self, frame: EncodedFrame, key: Optional[Hashable] = None) -> bool:
+        """Queue a frame; returns False if the connection must be dropped."""
+        if len(self._queue) >= self._max_queue:
+            if self._policy == OverflowPolicy.DISCONNECT:
+                return False
+            if self._policy == OverflowPolicy.COALESCE and key is not None:
+                for index, (queued_key, _) in enumerate(self._queue):
+                    if queued_key == key:
+                        self._queue[index] = (key, frame)
+                        self.coalesced += 1
+                        return True
+            self._queue.popleft()
+            self.dropped += 1
+
+        self._queue.append((key, frame))
+        self._ready.set()
+        return True
+
+    async def _run(self):
+        while True:
+            await self._ready.wait()
+            while self._queue:
+                _, frame = self._queue.popleft()
+                if 0 < self._binary_threshold <= frame.size:
+                    send = self.websocket.send_bytes(frame.data)
+                else:
+                    send = self.websocket.send_text(frame.text)
+                try:
+                    await asyncio.wait_for(send, self._send_timeout)
+                except SEND_ERRORS as e:
+                    logger.warning("WebSocket send to user %s failed: %r", self.user_id, e)
+                    self._writer = None
+                    self._on_failure(self)
+                    return
+                self.sent += 1
+            if self._draining:
+                return
+            self._ready.clear()
+
+    async def close(self, flush: bool = False):
+        """Close the socket; with ``flush`` send the queued frames first, within ``send_timeout``"""
+        writer = self._writer
+        if flush and writer is not None:
+            # Писатель отправляет оставшиеся кадры и завершается
+            self._draining = True
+            self._ready.set()
+            done, _ = await asyncio.wait({writer}, timeout=self._send_timeout)
+            if not done:
+                logger.warning("WebSocket flush to user %s timed out", self.user_id)
+        self.stop()
+        try:
+            await asyncio.wait_for(self.websocket.close(), self._send_timeout)
+        except SEND_ERRORS:
+            pass
 
 
 class WebSocketManager:
-    def __init__(self):
-        self._active_connections: Dict[int, WebSocket] = {}
+    def __init__(
+            self,
+            send_timeout: float = 5.0,
+            max_queue: int = 256,
+            overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+            backend: Optional[BroadcastBackend] = None,
+            codec: Optional[FrameCodec] = None,
+            binary_threshold: int = 0,
+            session_factory=None,
+    ):
+        self._backend = backend or BroadcastBackend()
+        self._codec = codec or FrameCodec()
+        # Сессии нужны только для кадров, опубликованных ссылкой на сообщение
+        self._session_factory = session_factory
+        # Свои публикации воркер уже доставил локально и пропускает
+        self._origin = uuid.uuid4().hex[:12]
+        self._active_connections: Dict[int, Connection] = {}
         self._user_chats: Dict[int, Set[int]] = {}
+        # Обратный индекс: chat_id -> подключённые участники
+        self._chat_subscribers: Dict[int, Set[int]] = {}
+        self._send_timeout = send_timeout
+        self._max_queue = max_queue
+        self._binary_threshold = binary_threshold
+        self._overflow_policy = OverflowPolicy(overflow_policy)
+        self._background_tasks: Set[asyncio.Task] = set()
+
+        # Счётчики закрытых соединений, чтобы статистика не терялась
+        self._dropped_total = 0
+        self._coalesced_total = 0
+        self._evicted_total = 0
+
+    async def start(self):
+        await self._backend.start(self._deliver)
+        for chat_id in self._chat_subscribers:
+            await self._backend.subscribe(chat_id)
+
+    async def stop(self):
+        # Уже принятые события досылаются клиентам перед закрытием
+        connections = list(self._active_connections.values())
+        await asyncio.gather(
+            *(connection.close(flush=True) for connection in connections),
+            return_exceptions=True,
+        )
+        for connection in connections:
+            self.disconnect(connection.user_id, connection.websocket)
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        await self._backend.stop()
 
     async def connect(self, websocket: WebSocket, user_id: int):
         await websocket.accept()
-        self._active_connections[user_id] = websocket
+        previous = self._active_connections.get(user_id)
+        if previous is not None:
+            self._evict(previous)
+
+        connection = Connection(
+            websocket,
+            user_id,
+            max_queue=self._max_queue,
+            policy=self._overflow_policy,
+            send_timeout=self._send_timeout,
+            on_failure=self._evict,
+            binary_threshold=self._binary_threshold,
+        )
+        connection.start()
+        self._active_connections[user_id] = connection
         self._user_chats[user_id] = set()
 
-    def disconnect(self, user_id: int):
-        if user_id in self._active_connections:
-            del self._active_connections[user_id]
-        if user_id in self._user_chats:
-            del self._user_chats[user_id]
+    def disconnect(self, user_id: int, websocket: Optional[WebSocket] = None):
+        connection = self._active_connections.get(user_id)
+        if connection is None:
+            return
+        # Старый обработчик не должен отключать новое соединение пользователя
+        if websocket is not None and connection.websocket is not websocket:
+            return
+
+        del self._active_connections[user_id]
+        connection.stop()
+        self._dropped_total += connection.dropped
+        self._coalesced_total += connection.coalesced
+
+        for chat_id in self._user_chats.pop(user_id, set()):
+            subscribers = self._chat_subscribers.get(chat_id)
+            if subscribers is not None:
+                subscribers.discard(user_id)
+                if not subscribers:
+                    del self._chat_subscribers[chat_id]
+                    self._run_in_background(self._backend.unsubscribe(chat_id))
 
     def add_user_to_chat(self, user_id: int, chat_id: int):
         if user_id in self._user_chats:
             self._user_chats[user_id].add(chat_id)
+            if chat_id not in self._chat_subscribers:
+                self._chat_subscribers[chat_id] = set()
+                self._run_in_background(self._backend.subscribe(chat_id))
+            self._chat_subscribers[chat_id].add(user_id)
 
     async def broadcast_to_chat(
             self,
             message: WebSocketMessage,
             exclude_user_id: Optional[int] = None,
+            message_id: Optional[int] = None,
     ):
-        # Создаем ответ с текущим временем
-        response = WebSocketResponse(
-            event="message",
-            data=message.model_dump() | {"timestamp": datetime.now(UTC)},
-            timestamp=datetime.now(UTC),
+        """Deliver an event to the chat's subscribers on every worker.
+
+        Subscribers connected to this worker get the frame right away; the
+        backend carries it to the other workers. A frame over the backend's
+        payload limit is published as a reference to the stored message
+        ``message_id``, which the other workers read from the database.
+        """
+        # Создаем ответ с текущим временем; кадр кодируется один раз на событие
+        now = datetime.now(UTC)
+        frame = self._encode(message, now)
+        self._deliver_frame(message.chat_id, frame, exclude_user_id, message.type)
+        if self._backend.is_local:
+            return
+
+        # Заголовок разбирается без JSON: "origin|exclude_user_id|type|message_id|frame",
+        # message_id заполнен только у ссылки, тогда вместо кадра - время события
+        exclude = "" if exclude_user_id is None else str(exclude_user_id)
+        kind = message.type.replace("|", "")
+        header = f"{self._origin}|{exclude}|{kind}|"
+        payload = f"{header}|{frame.text}"
+        limit = self._backend.MAX_PAYLOAD_BYTES
+        if limit is not None and len(header.encode()) + 1 + len(frame.data) > limit:
+            if message_id is None:
+                logger.error("Broadcast frame for chat %s exceeds the backend payload limit", message.chat_id)
+                return
+            payload = f"{header}{message_id}|{now.isoformat()}"
+
+        try:
+            await self._backend.publish(message.chat_id, payload)
+        except Exception as e:
+            logger.error("Broadcast publish for chat %s failed: %r", message.chat_id, e)
+
+    def _encode(self, message: WebSocketMessage, now: datetime) -> EncodedFrame:
+        return self._codec.encode_event(
+            "message",
+            message.model_dump() | {"timestamp": now},
+            now,
         )
 
-        json_response = response.model_dump_json()
+    def _deliver(self, chat_id: int, data: str):
+        """Enqueue a frame received from the broadcast backend"""
+        if not self._chat_subscribers.get(chat_id):
+            return
 
-        for user_id, chats in self._user_chats.items():
-            if (
-                    user_id != exclude_user_id and
-                    message.chat_id in chats and
-                    user_id in self._active_connections
-            ):
-                await self._active_connections[user_id].send_text(json_response)
+        origin, exclude, kind, message_id, payload = data.split("|", 4)
+        if origin == self._origin:
+            return
+        exclude_user_id = int(exclude) if exclude else None
+        if message_id:
+            self._run_in_background(
+                self._deliver_stored(chat_id, int(message_id), payload, exclude_user_id, kind),
+            )
+            return
+        self._deliver_frame(chat_id, EncodedFrame(payload), exclude_user_id, kind)
+
+    async def _deliver_stored(
+            self,
+            chat_id: int,
+            message_id: int,
+            timestamp: str,
+            exclude_user_id: Optional[int],
+            kind: str,
+    ):
+        """Encode and enqueue a frame published as a reference to a stored message"""
+        if self._session_factory is None:
+            logger.error("Broadcast reference to message %s received without a session factory", message_id)
+            return
+        try:
+            async with self._session_factory() as session:
+                text = await MessageRepository(session).get_message_text(chat_id, message_id)
+        except Exception as e:
+            logger.error("Broadcast reference to message %s failed: %r", message_id, e)
+            return
+        if text is None:
+            logger.warning("Broadcast reference to missing message %s of chat %s", message_id, chat_id)
+            return
+
+        message = WebSocketMessage(type=kind, chat_id=chat_id, content=text)
+        frame = self._encode(message, datetime.fromisoformat(timestamp))
+        self._deliver_frame(chat_id, frame, exclude_user_id, kind)
+
+    def _deliver_frame(
+            self,
+            chat_id: int,
+            frame: EncodedFrame,
+            exclude_user_id: Optional[int],
+            kind: str,
+    ):
+        """Enqueue one shared frame to this worker's subscribers of the chat"""
+        subscribers = self._chat_subscribers.get(chat_id)
+        if not subscribers:
+            return
+
+        # Сообщения не схлопываются, служебные события (typing, read) - да
+        key = None if kind == "message" else (kind, chat_id)
+
+        fanout = 0
+        for user_id in list(subscribers):
+            if user_id == exclude_user_id:
+                continue
+            connection = self._active_connections.get(user_id)
+            if connection is None:
+                continue
+            if connection.enqueue(frame, key):
+                fanout += 1
+            else:
+                self._evict(connection)
+        broadcast_fanout.observe(fanout)
 
     async def send_personal_message(
             self,
             user_id: int,
-            message: str,
+            message: Union[str, EncodedFrame],
     ):
-        if user_id in self._active_connections:
-            await self._active_connections[user_id].send_text(message)
+        connection = self._active_connections.get(user_id)
+        if connection is None:
+            return
+        frame = message if isinstance(message, EncodedFrame) else EncodedFrame(message)
+        if not connection.enqueue(frame):
+            self._evict(connection)
+
+    def stats(self) -> dict:
+        """Queue depth and drop counters across all connections"""
+        connections = list(self._active_connections.values())
+        depths = [c.queue_depth for c in connections]
+        return {
+            "connections": len(connections),
+            "user_chats": len(self._user_chats),
+            "chat_subscriptions": sum(len(chats) for chats in self._user_chats.values()),
+            "subscribed_chats": len(self._chat_subscribers),
+            "queue_depth": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "dropped": self._dropped_total + sum(c.dropped for c in connections),
+            "coalesced": self._coalesced_total + sum(c.coalesced for c in connections),
+            "evicted": self._evicted_total,
+        }
+
+    def _evict(self, connection: Connection):
+        """Drop a dead, slow or overflowing connection without blocking."""
+        if self._active_connections.get(connection.user_id) is not connection:
+            return
+        logger.warning("Evicting WebSocket of user %s", connection.user_id)
+        self._evicted_total += 1
+        self.disconnect(connection.user_id)
+        self._run_in_background(connection.close())
+
+    def _run_in_background(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
@@ -0,0 +1,63 @@
+# app/tests/bench_codec.py
+"""Frames/sec on one core for parse -> validate -> serialize.
+
+Compares the previous json.loads + WebSocketMessage(**data) path with
+each installed codec; no database is needed:
+
+    python -m app.tests.bench_codec --frames 200000
+"""
+import argparse
+import json
+import time
+from datetime import UTC, datetime
+
+from app.schemas.websocket_schema import WebSocketMessage, WebSocketResponse
+from app.utils.codec import ACK_FRAME, CODECS
+
+FRAME = json.dumps({"type": "message", "chat_id": 42, "content": "Hello, how are you doing today?"})
+
+
+def baseline(raw: str) -> tuple:
+    message = WebSocketMessage(**json.loads(raw))
+    ack = json.dumps({"status": "received"})
+    now = datetime.now(UTC)
+    response = WebSocketResponse(
+        event="message",
+        data=message.model_dump() | {"timestamp": now},
+        timestamp=now,
+    )
+    return ack, response.model_dump_json()
+
+
+def run(frames: int):
+    candidates = {"json + pydantic (before)": baseline}
+    for name, codec_class in CODECS.items():
+        try:
+            codec = codec_class()
+        except ImportError:
+            print(f"{name:<26} skipped: package not installed")
+            continue
+
+        def pipeline(raw: str, codec=codec) -> tuple:
+            message = codec.decode_message(raw)
+            now = datetime.now(UTC)
+            frame = codec.encode_event("message", message.model_dump() | {"timestamp": now}, now)
+            return ACK_FRAME, frame.text
+
+        candidates[name] = pipeline
+
+    for name, pipeline in candidates.items():
+        for _ in range(1000):
+            pipeline(FRAME)
+        started = time.perf_counter()
+        for _ in range(frames):
+            pipeline(FRAME)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<26} {frames / elapsed:>12,.0f} frames/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=100000)
+    args = parser.parse_args()
+    run(args.frames)
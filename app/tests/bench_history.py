@@ -0,0 +1,124 @@
+# app/tests/bench_history.py
+"""Requests/sec for GET /api/history/{chat_id} per settings profile.
+
+Every profile runs in its own process, because the engine is configured
+from the environment at import time. Requests go straight to the ASGI
+app, so the numbers exclude HTTP server overhead:
+
+    python -m app.tests.bench_history --chat-id 1 --profiles development production
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+async def asgi_get(app, path: str, query: str = "", headers: list = ()) -> tuple:
+    """Issue a GET directly against an ASGI app; returns (status, body)"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"bench"), *headers],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    status = None
+    body = bytearray()
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            body.extend(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, bytes(body)
+
+
+async def measure(path: str, query: str, duration: float, concurrency: int) -> dict:
+    from app.database import engine
+    from app.main import app
+
+    # Прогрев: соединения в пуле и кэши запросов
+    for _ in range(concurrency):
+        await asgi_get(app, path, query)
+
+    completed = 0
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal completed, errors
+        while time.perf_counter() < deadline:
+            status, _ = await asgi_get(app, path, query)
+            if status == 200:
+                completed += 1
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+
+    return {
+        "requests": completed,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(completed / elapsed, 1),
+    }
+
+
+def run_profile(profile: str, args) -> dict:
+    command = [
+        sys.executable, "-m", "app.tests.bench_history", "--worker",
+        "--chat-id", str(args.chat_id),
+        "--query", args.query,
+        "--duration", str(args.duration),
+        "--concurrency", str(args.concurrency),
+    ]
+    output = subprocess.run(
+        command,
+        env=os.environ | {"APP_PROFILE": profile},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Последняя строка - результат, выше может быть SQL echo
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chat-id", type=int, default=1)
+    parser.add_argument("--query", default="limit=50")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--profiles", nargs="+", default=["development", "production"])
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = asyncio.run(
+            measure(f"/api/history/{args.chat_id}", args.query, args.duration, args.concurrency),
+        )
+        print(json.dumps(result))
+    else:
+        for profile in args.profiles:
+            result = run_profile(profile, args)
+            print(f"{profile:<12} {result['requests_per_second']:>9} req/s  "
+                  f"({result['requests']} ok, {result['errors']} errors)")
@@ -0,0 +1,94 @@
+# app/tests/bench_history_json.py
+"""Parity and pages/sec for Postgres-rendered history pages.
+
+First checks that ``get_chat_history_json`` returns the same document as
+the pydantic ``MessageList`` path for offset, latest, before and after
+pages of the chat, then measures both renders. Exits with an error on
+any difference. The history cache is disabled for the run, so both
+paths read from the database:
+
+    python -m app.tests.bench_history_json --chat-id 1 --limit 100 --iterations 2000
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from app.database import AsyncSessionLocal, engine
+from app.repositories.message_repo import history_cache
+from app.services.message_service import MessageService
+
+
+async def python_page(chat_id: int, **params) -> str:
+    async with AsyncSessionLocal() as session:
+        page = await MessageService(session).get_chat_history(chat_id, **params)
+        return page.model_dump_json()
+
+
+async def postgres_page(chat_id: int, **params) -> str:
+    async with AsyncSessionLocal() as session:
+        return await MessageService(session).get_chat_history_json(chat_id, **params)
+
+
+async def check_parity(chat_id: int, limit: int) -> list:
+    """Pages where the two renders differ, as (params, python, postgres)"""
+    cases = [{"limit": limit}, {"limit": limit, "offset": limit}, {"limit": limit, "latest": True}]
+
+    latest = json.loads(await python_page(chat_id, limit=limit, latest=True))
+    if latest["next_cursor"]:
+        cases.append({"limit": limit, "before": latest["next_cursor"]})
+    first = json.loads(await python_page(chat_id, limit=limit))
+    if first["next_cursor"]:
+        cases.append({"limit": limit, "after": first["next_cursor"]})
+
+    differences = []
+    for params in cases:
+        expected = await python_page(chat_id, **params)
+        actual = await postgres_page(chat_id, **params)
+        if json.loads(expected) != json.loads(actual):
+            differences.append((params, expected, actual))
+    return differences
+
+
+async def measure(page, chat_id: int, limit: int, iterations: int) -> dict:
+    # Прогрев: соединение в пуле и кэш подготовленных запросов
+    for _ in range(min(iterations, 50)):
+        await page(chat_id, limit=limit, latest=True)
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await page(chat_id, limit=limit, latest=True)
+    elapsed = time.perf_counter() - started
+    return {
+        "pages_per_second": round(iterations / elapsed, 1),
+        "us_per_page": round(elapsed / iterations * 1_000_000, 1),
+    }
+
+
+async def run(chat_id: int, limit: int, iterations: int) -> bool:
+    history_cache.max_bytes = 0
+
+    differences = await check_parity(chat_id, limit)
+    for params, expected, actual in differences:
+        print(f"MISMATCH {params}\n  python:   {expected[:300]}\n  postgres: {actual[:300]}")
+
+    results = {
+        "python": await measure(python_page, chat_id, limit, iterations),
+        "postgres": await measure(postgres_page, chat_id, limit, iterations),
+    }
+    await engine.dispose()
+
+    for name, result in results.items():
+        print(f"{name:<9} {result['pages_per_second']:>9} pages/s  {result['us_per_page']:>9} us/page")
+    return not differences
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chat-id", type=int, default=1)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    if not asyncio.run(run(args.chat_id, args.limit, args.iterations)):
+        sys.exit(1)
@@ -0,0 +1,79 @@
+# app/tests/bench_history_read.py
+"""Pages/sec for one history page: ORM hydration vs column rows.
+
+``orm`` is the previous read path: ``select(Message)`` builds ORM objects
+in the identity map and ``MessageList`` re-validates them with
+``from_attributes``. ``core`` is ``MessageRepository.get_chat_messages``:
+column rows turned straight into response models. Both serialize the
+page to JSON. Every iteration uses a fresh session, as a request does:
+
+    python -m app.tests.bench_history_read --chat-id 1 --limit 100 --iterations 2000
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal, engine
+from app.models.message import Message
+from app.repositories.message_repo import MessageRepository
+from app.schemas.message_schema import MessageList
+
+
+async def orm_page(chat_id: int, limit: int) -> bytes:
+    async with AsyncSessionLocal() as session:
+        query = (
+            select(Message)
+            .filter(Message.chat_id == chat_id)
+            .order_by(Message.timestamp.asc(), Message.id.asc())
+            .limit(limit)
+        )
+        messages = (await session.execute(query)).scalars().all()
+        return MessageList.model_validate({"messages": messages}).model_dump_json().encode()
+
+
+async def core_page(chat_id: int, limit: int) -> bytes:
+    async with AsyncSessionLocal() as session:
+        messages = await MessageRepository(session).get_chat_messages(chat_id, limit=limit)
+        return MessageList(messages=messages).model_dump_json().encode()
+
+
+async def measure(page, chat_id: int, limit: int, iterations: int) -> dict:
+    # Прогрев: соединение в пуле и кэш подготовленных запросов
+    for _ in range(min(iterations, 50)):
+        body = await page(chat_id, limit)
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        body = await page(chat_id, limit)
+    elapsed = time.perf_counter() - started
+    return {
+        "pages_per_second": round(iterations / elapsed, 1),
+        "us_per_page": round(elapsed / iterations * 1_000_000, 1),
+        "bytes": len(body),
+    }
+
+
+async def run(chat_id: int, limit: int, iterations: int):
+    results = {
+        "orm": await measure(orm_page, chat_id, limit, iterations),
+        "core": await measure(core_page, chat_id, limit, iterations),
+    }
+    await engine.dispose()
+
+    if results["orm"]["bytes"] != results["core"]["bytes"]:
+        print("warning: the two paths produced different responses")
+    for name, result in results.items():
+        print(f"{name:<6} {result['pages_per_second']:>9} pages/s  {result['us_per_page']:>9} us/page")
+    speedup = results["orm"]["us_per_page"] / results["core"]["us_per_page"]
+    print(f"core is {speedup:.2f}x faster than orm for {limit}-message pages")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chat-id", type=int, default=1)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.chat_id, args.limit, args.iterations))
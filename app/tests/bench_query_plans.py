@@ -0,0 +1,96 @@
+# app/tests/bench_query_plans.py
+"""Query plans for the history and membership hot paths.
+
+Seeds a synthetic dataset inside a transaction, prints ``EXPLAIN ANALYZE``
+with the hot-path indexes dropped ("before") and in place ("after"), then
+rolls everything back. Run after ``alembic upgrade head``:
+
+    python -m app.tests.bench_query_plans --chats 2000 --messages-per-chat 500
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.database import engine
+from app.utils.logger import logger
+
+SEED_STATEMENTS = [
+    "INSERT INTO users (id, username) "
+    "SELECT 1000000 + g, 'bench_user_' || g FROM generate_series(1, :users) g",
+    "INSERT INTO chats (id) SELECT 1000000 + g FROM generate_series(1, :chats) g",
+    "INSERT INTO chat_users (chat_id, user_id) "
+    "SELECT 1000000 + g, 1000000 + 1 + (g % :users) FROM generate_series(1, :chats) g "
+    "UNION ALL "
+    "SELECT 1000000 + g, 1000000 + 1 + ((g + 1) % :users) FROM generate_series(1, :chats) g",
+    "INSERT INTO messages (text, chat_id, sender_id, receiver_id, timestamp) "
+    "SELECT 'message ' || m, 1000000 + c, 1000000 + 1 + (c % :users), "
+    "1000000 + 1 + ((c + 1) % :users), now() - (m || ' seconds')::interval "
+    "FROM generate_series(1, :chats) c, generate_series(1, :messages_per_chat) m",
+    "ANALYZE users",
+    "ANALYZE chats",
+    "ANALYZE chat_users",
+    "ANALYZE messages",
+]
+
+DROP_INDEX_STATEMENTS = [
+    "DROP INDEX ix_messages_chat_id_timestamp_id",
+    "DROP INDEX ix_chat_users_user_id_chat_id",
+    "ALTER TABLE chat_users DROP CONSTRAINT chat_users_pkey",
+]
+
+QUERIES = {
+    "history page (get_chat_messages)": (
+        "SELECT * FROM messages WHERE chat_id = :chat_id "
+        "ORDER BY timestamp, id LIMIT 50"
+    ),
+    "chat participants (get_chat_with_participants)": (
+        "SELECT users.* FROM users JOIN chat_users ON users.id = chat_users.user_id "
+        "WHERE chat_users.chat_id = :chat_id"
+    ),
+    "user chats (get_user_chat_summaries)": (
+        "SELECT users.id, chat_users.chat_id FROM users "
+        "LEFT JOIN chat_users ON chat_users.user_id = users.id "
+        "WHERE users.id = :user_id ORDER BY chat_users.chat_id"
+    ),
+}
+
+
+async def explain_all(conn: AsyncConnection, params: dict) -> dict:
+    plans = {}
+    for name, query in QUERIES.items():
+        result = await conn.execute(text(f"EXPLAIN ANALYZE {query}"), params)
+        plans[name] = "\n".join(row[0] for row in result)
+    return plans
+
+
+async def run(users: int, chats: int, messages_per_chat: int):
+    seed_params = {"users": users, "chats": chats, "messages_per_chat": messages_per_chat}
+    query_params = {"chat_id": 1000000 + chats // 2, "user_id": 1000000 + 1 + users // 2}
+
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            logger.info("Seeding %d chats x %d messages", chats, messages_per_chat)
+            for statement in SEED_STATEMENTS:
+                await conn.execute(text(statement), seed_params)
+
+            after = await explain_all(conn, query_params)
+            for statement in DROP_INDEX_STATEMENTS:
+                await conn.execute(text(statement))
+            before = await explain_all(conn, query_params)
+        finally:
+            await transaction.rollback()
+
+    for name in QUERIES:
+        print(f"=== {name}\n--- before\n{before[name]}\n--- after\n{after[name]}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--chats", type=int, default=2000)
+    parser.add_argument("--messages-per-chat", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args.users, args.chats, args.messages_per_chat))
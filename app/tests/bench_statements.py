@@ -0,0 +1,102 @@
+# app/tests/bench_statements.py
+"""Statements issued per create on the repository write paths, with timings.
+
+Every create runs inside an outer transaction that is rolled back, so
+the database is left untouched. The expected counts are asserted by
+``test_statements.py``:
+
+    python -m app.tests.bench_statements --iterations 200
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from typing import Dict, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.database import engine
+from app.models.user import User
+from app.repositories.chat_repo import ChatRepository
+from app.repositories.message_repo import MessageRepository
+from app.repositories.user_repo import UserRepository
+
+IGNORED_PREFIXES = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith(IGNORED_PREFIXES):
+            self.count += 1
+
+
+async def measure(engine: AsyncEngine, iterations: int) -> Dict[str, Tuple[float, float]]:
+    """create -> (statements per create, ms per create)"""
+    counter = StatementCounter()
+    results = {}
+
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        event.listen(conn.sync_connection, "before_cursor_execute", counter)
+        try:
+            # commit() в репозиториях превращается в RELEASE SAVEPOINT
+            session = AsyncSession(
+                bind=conn,
+                expire_on_commit=False,
+                join_transaction_mode="create_savepoint",
+            )
+            users = [
+                User(username=f"bench_{uuid.uuid4().hex}"),
+                User(username=f"bench_{uuid.uuid4().hex}"),
+            ]
+            session.add_all(users)
+            await session.commit()
+            participant_ids = [user.id for user in users]
+            chat = await ChatRepository(session).create_chat(participant_ids)
+
+            operations = {
+                "BaseRepository.create (user)": lambda: UserRepository(session).create(
+                    username=f"bench_{uuid.uuid4().hex}",
+                ),
+                "ChatRepository.create_chat": lambda: ChatRepository(session).create_chat(
+                    participant_ids,
+                ),
+                "MessageRepository.create_message": lambda: MessageRepository(
+                    session,
+                ).create_message(
+                    chat_id=chat.id,
+                    sender_id=participant_ids[0],
+                    receiver_id=participant_ids[1],
+                    text="benchmark",
+                ),
+            }
+
+            for name, operation in operations.items():
+                counter.count = 0
+                started = time.perf_counter()
+                for _ in range(iterations):
+                    await operation()
+                elapsed = time.perf_counter() - started
+                results[name] = (counter.count / iterations, elapsed / iterations * 1000)
+        finally:
+            event.remove(conn.sync_connection, "before_cursor_execute", counter)
+            await transaction.rollback()
+    return results
+
+
+async def run(iterations: int):
+    results = await measure(engine, iterations)
+    await engine.dispose()
+    for name, (statements, ms) in results.items():
+        print(f"{name:<36} {statements:5.2f} statements/create  {ms:7.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.iterations))
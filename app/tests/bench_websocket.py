@@ -0,0 +1,255 @@
+# app/tests/bench_websocket.py
+"""WebSocket load test: delivery latency, ack latency and throughput.
+
+Opens one ``/ws/{user_id}`` connection per seeded user (see
+``app.utils.create_test_data``), taking the participants of the first
+chats so that every message has a connected receiver. Together the
+senders produce ``--rate`` messages/sec into their own chats. Each message
+carries a token, so the receiving side measures send -> broadcast-receive
+latency; acks are matched to sends in order. Samples from the warmup
+period are discarded. The JSON report can be compared across commits:
+
+    python -m app.tests.bench_websocket --url ws://localhost:8000 \\
+        --connections 2000 --rate 5000 --duration 30 --output ws-report.json
+
+Thousands of sockets need a raised open files limit (``ulimit -n``).
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import subprocess
+import time
+from collections import defaultdict, deque
+from datetime import UTC, datetime
+from typing import Deque, Dict, List
+
+from sqlalchemy import text
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+from app.database import engine
+
+TOKEN_PREFIX = "bench:"
+
+
+class Stats:
+    """Latency samples and counters shared by all connections"""
+
+    def __init__(self, clients: int):
+        self.clients = clients
+        self.sent_at: Dict[str, float] = {}
+        self.delivery: List[float] = []
+        self.ack: List[float] = []
+        self.sent = 0
+        self.delivered = 0
+        self.acked = 0
+        self.rejected = 0
+        self.errors = 0
+        self.connected = 0
+        self.deadline = 0.0
+        self.start = asyncio.Event()
+        # Каждый клиент либо подключился, либо завершился ошибкой
+        self.settled = asyncio.Event()
+
+    def count_connection(self, connected: bool):
+        if connected:
+            self.connected += 1
+        else:
+            self.errors += 1
+        if self.connected + self.errors >= self.clients:
+            self.settled.set()
+
+    def reset(self):
+        self.delivery.clear()
+        self.ack.clear()
+        self.sent = self.delivered = self.acked = self.rejected = 0
+
+
+def percentiles(samples: List[float]) -> dict:
+    """Nearest-rank percentiles in milliseconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(p: float) -> float:
+        index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50": rank(50),
+        "p95": rank(95),
+        "p99": rank(99),
+        "max": round(ordered[-1] * 1000, 3),
+    }
+
+
+async def load_participants(connections: int) -> Dict[int, List[int]]:
+    """user_id -> chat ids, for the participants of the first chats"""
+    query = text(
+        "SELECT chat_id, user_id FROM chat_users "
+        "WHERE chat_id IN (SELECT id FROM chats ORDER BY id LIMIT :chats)",
+    )
+    async with engine.connect() as conn:
+        rows = (await conn.execute(query, {"chats": connections})).all()
+    await engine.dispose()
+
+    user_chats: Dict[int, List[int]] = defaultdict(list)
+    for chat_id, user_id in rows:
+        user_chats[user_id].append(chat_id)
+    return dict(list(user_chats.items())[:connections])
+
+
+async def client(
+        url: str,
+        user_id: int,
+        chat_ids: List[int],
+        interval: float,
+        stats: Stats,
+        semaphore: asyncio.Semaphore,
+):
+    pending_acks: Deque[float] = deque()
+    sequence = 0
+
+    async def read(websocket):
+        async for raw in websocket:
+            now = time.perf_counter()
+            frame = json.loads(raw)
+            if "status" in frame:
+                # Пакетный режим подтверждает несколько кадров одним ответом
+                count = len(frame.get("message_ids", [])) + frame.get("rejected", 0) or 1
+                stats.rejected += frame.get("rejected", 0)
+                for _ in range(min(count, len(pending_acks))):
+                    stats.ack.append(now - pending_acks.popleft())
+                    stats.acked += 1
+                continue
+
+            token = frame.get("data", {}).get("content", "")
+            sent_at = stats.sent_at.pop(token, None)
+            if sent_at is not None:
+                stats.delivery.append(now - sent_at)
+                stats.delivered += 1
+
+    try:
+        # Соединения открываются порциями, чтобы не переполнить backlog сервера
+        async with semaphore:
+            websocket = await connect(f"{url}/ws/{user_id}", max_queue=None)
+        stats.count_connection(connected=True)
+        async with websocket:
+            reader = asyncio.create_task(read(websocket))
+            await stats.start.wait()
+            # Случайный сдвиг, чтобы отправители не шли в ногу
+            await asyncio.sleep(random.random() * interval)
+
+            next_send = time.perf_counter()
+            while next_send < stats.deadline:
+                token = f"{TOKEN_PREFIX}{user_id}:{sequence}"
+                sequence += 1
+                frame = {"type": "message", "chat_id": random.choice(chat_ids), "content": token}
+                now = time.perf_counter()
+                stats.sent_at[token] = now
+                pending_acks.append(now)
+                await websocket.send(json.dumps(frame))
+                stats.sent += 1
+
+                next_send += interval
+                await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+
+            # Даём доставиться сообщениям, отправленным в последний момент
+            await asyncio.sleep(1.0)
+            reader.cancel()
+    except (ConnectionClosed, OSError):
+        stats.count_connection(connected=False)
+
+
+def git_commit() -> str:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+    return output.stdout.strip()
+
+
+async def run(args) -> dict:
+    user_chats = await load_participants(args.connections)
+    if not user_chats:
+        msg = "No chats found, seed the database with app.utils.create_test_data first"
+        raise RuntimeError(msg)
+
+    stats = Stats(clients=len(user_chats))
+    interval = len(user_chats) / args.rate
+    semaphore = asyncio.Semaphore(args.connect_concurrency)
+    started = time.perf_counter()
+    tasks = [
+        asyncio.create_task(client(args.url, user_id, chat_ids, interval, stats, semaphore))
+        for user_id, chat_ids in user_chats.items()
+    ]
+
+    with contextlib.suppress(TimeoutError):
+        await asyncio.wait_for(stats.settled.wait(), args.connect_timeout)
+    connected_in = time.perf_counter() - started
+
+    stats.deadline = time.perf_counter() + args.warmup + args.duration
+    stats.start.set()
+    await asyncio.sleep(args.warmup)
+    stats.reset()
+    measured_from = time.perf_counter()
+    await asyncio.sleep(max(0.0, stats.deadline - measured_from))
+    measured = time.perf_counter() - measured_from
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    return {
+        "label": args.label,
+        "commit": git_commit(),
+        "started_at": datetime.now(UTC).isoformat(),
+        "config": {
+            "url": args.url,
+            "connections": len(user_chats),
+            "connected": stats.connected,
+            "rate": args.rate,
+            "warmup": args.warmup,
+            "duration": args.duration,
+        },
+        "connect_seconds": round(connected_in, 3),
+        "connection_errors": stats.errors,
+        "delivery_latency_ms": percentiles(stats.delivery),
+        "ack_latency_ms": percentiles(stats.ack),
+        "throughput": {
+            "sent_per_second": round(stats.sent / measured, 1),
+            "delivered_per_second": round(stats.delivered / measured, 1),
+            "acked_per_second": round(stats.acked / measured, 1),
+        },
+        "sent": stats.sent,
+        "delivered": stats.delivered,
+        "acked": stats.acked,
+        "rejected": stats.rejected,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://localhost:8000")
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=1000.0, help="messages/sec over all connections")
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--connect-timeout", type=float, default=30.0)
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    parser.add_argument("--label", default="")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+    print(output)
@@ -0,0 +1,62 @@
+# app/tests/conftest.py
+"""Shared fixtures.
+
+Async tests run on asyncio through the anyio pytest plugin (anyio comes
+with FastAPI); mark them with ``pytest.mark.anyio``. Tests that need
+Postgres take the ``db_engine`` fixture and are skipped when the
+database from the settings is not reachable.
+"""
+from datetime import UTC, datetime
+from typing import NamedTuple, Tuple
+
+import pytest
+from sqlalchemy import text
+
+from app.database import AsyncSessionLocal, engine
+from app.repositories.chat_repo import ChatRepository
+from app.repositories.user_repo import UserRepository
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture
+async def db_engine():
+    """The application engine, disposed after the test"""
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    except Exception as e:
+        await engine.dispose()
+        pytest.skip(f"Postgres is not reachable: {e!r}")
+
+    yield engine
+    # Соединения пула привязаны к event loop этого теста
+    await engine.dispose()
+
+
+class SeededChat(NamedTuple):
+    id: int
+    user_ids: Tuple[int, int]
+
+
+@pytest.fixture
+async def chat(db_engine):
+    """A new two-person chat without messages, deleted with its users afterwards"""
+    suffix = datetime.now(UTC).strftime("%Y%m%d%H%M%S%f")
+    async with AsyncSessionLocal() as session:
+        users = UserRepository(session)
+        first = await users.create(username=f"test_a_{suffix}")
+        second = await users.create(username=f"test_b_{suffix}")
+        created = await ChatRepository(session).create_chat([first.id, second.id])
+        seeded = SeededChat(created.id, (first.id, second.id))
+
+    yield seeded
+
+    async with AsyncSessionLocal() as session:
+        await ChatRepository(session).delete(seeded.id)
+        users = UserRepository(session)
+        for user_id in seeded.user_ids:
+            await users.delete(user_id)
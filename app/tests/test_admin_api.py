@@ -0,0 +1,39 @@
+# app/tests/test_admin_api.py
+"""Admin token check:
+
+    python -m pytest app/tests/test_admin_api.py
+"""
+import pytest
+from fastapi import HTTPException
+
+from app.api.admin_api import require_admin
+from app.config import settings
+
+
+def status_of(token):
+    try:
+        require_admin(token)
+    except HTTPException as e:
+        return e.status_code
+    return 200
+
+
+def test_endpoints_are_hidden_without_a_configured_token(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", None)
+    assert status_of("secret") == 404
+
+
+@pytest.mark.parametrize(
+    ("token", "status"),
+    [
+        ("s3cret-token", 200),
+        (None, 403),
+        ("", 403),
+        ("s3cret-toke", 403),
+        ("s3cret-token-", 403),
+        ("сикрет", 403),
+    ],
+)
+def test_token_must_match(monkeypatch, token, status):
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3cret-token")
+    assert status_of(token) == status
@@ -0,0 +1,129 @@
+# app/tests/test_broadcast.py
+"""Broadcast backends recover from a lost connection.
+
+The Redis backend runs against an in-process stand-in for the pub/sub
+client; the Postgres test needs the database from the settings and is
+skipped when it is not reachable:
+
+    python -m pytest app/tests/test_broadcast.py
+"""
+import asyncio
+from typing import List, Optional, Set, Tuple
+
+import pytest
+from sqlalchemy import text
+
+from app.services.broadcast import PostgresBroadcastBackend, RedisBroadcastBackend
+
+pytestmark = pytest.mark.anyio
+
+
+class StandInPubSub:
+    def __init__(self, server: "StandInRedis"):
+        self._server = server
+        self._inbox: asyncio.Queue = asyncio.Queue()
+        self.channels: Set[str] = set()
+        self.broken = False
+
+    async def subscribe(self, *channels: str):
+        self._check()
+        self.channels.update(channels)
+        self._server.subscribed.set()
+
+    async def unsubscribe(self, *channels: str):
+        self._check()
+        self.channels.difference_update(channels)
+
+    async def get_message(self, timeout: float) -> Optional[dict]:
+        self._check()
+        try:
+            return await asyncio.wait_for(self._inbox.get(), timeout)
+        except TimeoutError:
+            self._check()
+            return None
+
+    async def aclose(self):
+        self._server.pubsubs.remove(self)
+
+    def _check(self):
+        if self.broken:
+            msg = "Connection closed by server."
+            raise ConnectionError(msg)
+
+
+class StandInRedis:
+    """Just enough of ``redis.asyncio.Redis`` for the broadcast backend"""
+
+    def __init__(self):
+        self.pubsubs: List[StandInPubSub] = []
+        self.subscribed = asyncio.Event()
+
+    def pubsub(self, ignore_subscribe_messages: bool = False) -> StandInPubSub:
+        pubsub = StandInPubSub(self)
+        self.pubsubs.append(pubsub)
+        return pubsub
+
+    async def publish(self, channel: str, data: str) -> int:
+        receivers = [p for p in self.pubsubs if channel in p.channels and not p.broken]
+        for pubsub in receivers:
+            pubsub._inbox.put_nowait({"type": "message", "channel": channel.encode(), "data": data.encode()})
+        return len(receivers)
+
+    def disconnect(self):
+        for pubsub in self.pubsubs:
+            pubsub.broken = True
+
+
+def collect(received: asyncio.Queue):
+    return lambda chat_id, data: received.put_nowait((chat_id, data))
+
+
+async def next_message(received: asyncio.Queue) -> Tuple[int, str]:
+    return await asyncio.wait_for(received.get(), 5.0)
+
+
+async def test_redis_backend_resubscribes_after_disconnect():
+    server = StandInRedis()
+    backend = RedisBroadcastBackend(server)
+    backend.RECONNECT_DELAY = 0.01
+    received: asyncio.Queue = asyncio.Queue()
+    await backend.start(collect(received))
+    await backend.subscribe(1)
+    await backend.subscribe(2)
+
+    await backend.publish(1, "before")
+    assert await next_message(received) == (1, "before")
+
+    server.subscribed.clear()
+    server.disconnect()
+    # Переподключение заменяет pub/sub на новый со всеми каналами
+    await asyncio.wait_for(server.subscribed.wait(), 5.0)
+    assert [p.channels for p in server.pubsubs] == [{"chat:1", "chat:2"}]
+    await backend.publish(2, "after")
+    assert await next_message(received) == (2, "after")
+    await backend.stop()
+
+
+async def test_postgres_backend_relistens_after_termination(db_engine):
+    backend = PostgresBroadcastBackend(db_engine)
+    backend.RECONNECT_DELAY = 0.01
+    received: asyncio.Queue = asyncio.Queue()
+    await backend.start(collect(received))
+    await backend.subscribe(1)
+    await backend.subscribe(2)
+
+    await backend.publish(1, "before")
+    assert await next_message(received) == (1, "before")
+
+    listener = backend._listener
+    lost = asyncio.get_running_loop().create_future()
+    listener.add_termination_listener(lambda connection: lost.set_result(None))
+    async with db_engine.connect() as conn:
+        await conn.execute(text("SELECT pg_terminate_backend(:pid)"), {"pid": listener.get_server_pid()})
+    await asyncio.wait_for(lost, 5.0)
+    await asyncio.wait_for(backend._reconnector, 5.0)
+    assert backend._listener is not listener
+
+    await backend.publish(2, "after")
+    assert await next_message(received) == (2, "after")
+    await backend.stop()
@@ -0,0 +1,62 @@
+# app/tests/test_cursor.py
+"""Keyset cursors of the history API:
+
+    python -m pytest app/tests/test_cursor.py
+"""
+import base64
+from datetime import UTC, datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.message_service import MessageService
+from app.utils.cursor import decode_cursor, encode_cursor
+
+
+def raw_cursor(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+@pytest.mark.parametrize(
+    "timestamp",
+    [
+        datetime(2026, 10, 18, 12, 30, 45, 123456, tzinfo=UTC),
+        datetime(2026, 10, 18, 12, 30, 45, tzinfo=UTC),
+        datetime(2026, 10, 18, 15, 30, 45, 1, tzinfo=timezone(timedelta(hours=3))),
+    ],
+)
+def test_round_trip(timestamp):
+    cursor = encode_cursor(timestamp, 359871)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (timestamp, 359871)
+    assert decode_cursor(cursor)[0].utcoffset() == timestamp.utcoffset()
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "",
+        "!!!not-base64!!!",
+        "a",
+        raw_cursor(b"\xff\xfe\xfd"),
+        raw_cursor(b"2026-10-18T12:30:45+00:00"),
+        raw_cursor(b"2026-10-18T12:30:45+00:00|abc"),
+        raw_cursor(b"yesterday|42"),
+    ],
+)
+def test_garbage_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+
+def test_naive_timestamp_is_rejected():
+    cursor = encode_cursor(datetime(2026, 10, 18, 12, 30, 45), 42)
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+
+def test_service_answers_bad_cursors_with_400():
+    with pytest.raises(HTTPException) as error:
+        MessageService(None)._parse_cursors("!!!not-base64!!!", None, latest=False)
+    assert error.value.status_code == 400
+    assert error.value.detail == "Invalid cursor"
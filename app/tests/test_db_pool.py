@@ -0,0 +1,89 @@
+# app/tests/test_db_pool.py
+"""Pool metrics: checkout waits are recorded apart from opening connections.
+
+Needs the database from the settings and is skipped when it is not
+reachable:
+
+    python -m pytest app/tests/test_db_pool.py
+"""
+import asyncio
+
+import asyncpg
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import database
+from app.config import settings
+from app.database import InstrumentedPool
+from app.utils.metrics import Histogram
+
+pytestmark = pytest.mark.anyio
+
+CONNECT_DELAY = 0.2
+
+
+@pytest.fixture
+async def slow_engine(db_engine):
+    """A one-connection pool whose connections take CONNECT_DELAY to open"""
+    url = db_engine.url
+
+    async def connect():
+        await asyncio.sleep(CONNECT_DELAY)
+        return await asyncpg.connect(
+            host=url.host,
+            port=url.port,
+            user=url.username,
+            password=url.password,
+            database=url.database,
+        )
+
+    engine = create_async_engine(
+        settings.get_engine_url(),
+        async_creator=connect,
+        poolclass=InstrumentedPool,
+        pool_size=1,
+        max_overflow=0,
+    )
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def metrics(slow_engine, monkeypatch):
+    """Fresh pool histograms, after ``db_engine`` has checked the database"""
+    wait = Histogram("wait", "")
+    connect = Histogram("connect", "")
+    monkeypatch.setattr(database, "db_pool_wait", wait)
+    monkeypatch.setattr(database, "db_connect", connect)
+    return wait, connect
+
+
+async def test_opening_a_connection_is_not_a_checkout_wait(metrics, slow_engine):
+    wait, connect = metrics
+    async with slow_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+    assert connect.count == 1
+    assert connect.sum >= CONNECT_DELAY
+    assert wait.count == 1
+    assert wait.sum < CONNECT_DELAY / 2
+
+
+async def test_checkout_from_an_exhausted_pool_is_a_wait(metrics, slow_engine):
+    wait, connect = metrics
+    async with slow_engine.connect() as first:
+        await first.execute(text("SELECT 1"))
+
+        async def second_checkout():
+            async with slow_engine.connect() as second:
+                await second.execute(text("SELECT 1"))
+
+        waiting = asyncio.ensure_future(second_checkout())
+        await asyncio.sleep(CONNECT_DELAY)
+    await asyncio.wait_for(waiting, 5.0)
+
+    # Второй checkout дождался первого соединения, новое не открывалось
+    assert connect.count == 1
+    assert wait.count == 2
+    assert wait.sum >= CONNECT_DELAY * 0.9
@@ -0,0 +1,75 @@
+# app/tests/test_export.py
+"""Chat export writes timestamps exactly like the history API.
+
+Runs on an in-memory stand-in for the message repository:
+
+    python -m pytest app/tests/test_export.py
+"""
+import csv
+import io
+import json
+from datetime import UTC, datetime
+from typing import List, NamedTuple
+
+import pytest
+
+from app.schemas.message_schema import Message, MessageList
+from app.services.message_service import MessageService
+
+pytestmark = pytest.mark.anyio
+
+# timestamptz приходит из базы в UTC
+TIMESTAMPS = [
+    datetime(2026, 10, 18, 12, 30, 45, tzinfo=UTC),
+    datetime(2026, 10, 18, 12, 30, 45, 120000, tzinfo=UTC),
+    datetime(2026, 10, 18, 12, 30, 46, 1, tzinfo=UTC),
+]
+
+
+class Row(NamedTuple):
+    id: int
+    chat_id: int
+    sender_id: int
+    receiver_id: int
+    text: str
+    timestamp: datetime
+
+
+class StandInMessageRepository:
+    def __init__(self, rows: List[Row]):
+        self.rows = rows
+
+    async def stream_chat_messages(self, chat_id: int, batch_size: int):
+        for start in range(0, len(self.rows), batch_size):
+            yield self.rows[start:start + batch_size]
+
+
+@pytest.fixture
+def rows() -> List[Row]:
+    return [Row(k, 7, 1, 2, f"message {k}", timestamp) for k, timestamp in enumerate(TIMESTAMPS, start=1)]
+
+
+def api_timestamps(rows: List[Row]) -> List[str]:
+    page = MessageList(messages=[Message(**row._asdict()) for row in rows])
+    return [message["timestamp"] for message in json.loads(page.model_dump_json())["messages"]]
+
+
+async def export(rows: List[Row], export_format: str) -> str:
+    service = MessageService(None)
+    service.message_repo = StandInMessageRepository(rows)
+    return "".join([chunk async for chunk in service.export_chat_history(7, export_format, chunk_rows=2)])
+
+
+async def test_ndjson_timestamps_match_the_api(rows):
+    lines = (await export(rows, "ndjson")).splitlines()
+    assert [json.loads(line)["timestamp"] for line in lines] == api_timestamps(rows)
+    assert api_timestamps(rows) == [
+        "2026-10-18T12:30:45Z",
+        "2026-10-18T12:30:45.120000Z",
+        "2026-10-18T12:30:46.000001Z",
+    ]
+
+
+async def test_csv_timestamps_match_the_api(rows):
+    records = list(csv.DictReader(io.StringIO(await export(rows, "csv"))))
+    assert [record["timestamp"] for record in records] == api_timestamps(rows)
@@ -0,0 +1,272 @@
+# app/tests/test_history_cache.py
+"""The history cache and the pages served from it.
+
+Pure Python: ``MessageService`` runs on a fresh cache and an in-memory
+stand-in for the message repository, no database needed:
+
+    python -m pytest app/tests/test_history_cache.py
+"""
+from datetime import UTC, datetime, timedelta
+from typing import List, Optional, Tuple
+
+import pytest
+
+from app.schemas.message_schema import Message
+from app.services import message_service
+from app.services.message_service import MessageService
+from app.utils.cache import ChatHistoryCache
+
+pytestmark = pytest.mark.anyio
+
+CHAT_ID = 7
+START = datetime(2026, 1, 1, tzinfo=UTC)
+
+
+def make_messages(count: int, first_id: int = 1, text: str = "x") -> List[Message]:
+    # Два сообщения на секунду: порядок внутри секунды задаёт id
+    return [
+        Message(
+            id=first_id + k,
+            text=text,
+            chat_id=CHAT_ID,
+            sender_id=1,
+            receiver_id=2,
+            timestamp=START + timedelta(seconds=(first_id + k) // 2),
+        )
+        for k in range(count)
+    ]
+
+
+def key(message: Message) -> Tuple[datetime, int]:
+    return message.timestamp, message.id
+
+
+def ids(messages: Optional[List[Message]]) -> Optional[List[int]]:
+    return None if messages is None else [m.id for m in messages]
+
+
+def message_size(text: str = "x") -> int:
+    return len(text.encode()) + ChatHistoryCache.MESSAGE_OVERHEAD_BYTES
+
+
+class StandInMessageRepository:
+    """Newest-first reads over an in-memory chat, counting the queries"""
+
+    def __init__(self, messages: List[Message]):
+        self.messages = messages
+        self.queries = 0
+
+    async def get_chat_messages_by_cursor(self, chat_id: int, limit: int, latest: bool = False, **kwargs):
+        self.queries += 1
+        return self.messages[-limit:]
+
+
+@pytest.fixture
+def cache(monkeypatch) -> ChatHistoryCache:
+    cache = ChatHistoryCache(max_bytes=10**6, per_chat=10)
+    monkeypatch.setattr(message_service, "history_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def service() -> MessageService:
+    return MessageService(None)
+
+
+def cached_page(service: MessageService, limit: int, offset: int = 0, before=None, after=None, latest=False):
+    return service._get_cached_page(CHAT_ID, limit, offset, before, after, latest)
+
+
+# ChatHistoryCache
+
+def test_put_keeps_the_newest_per_chat_messages():
+    cache = ChatHistoryCache(max_bytes=10**6, per_chat=3)
+    cache.put(CHAT_ID, make_messages(5), complete=True)
+
+    entry = cache.get(CHAT_ID)
+    assert ids(entry.messages) == [3, 4, 5]
+    assert not entry.complete
+    assert cache.stats()["bytes"] == 3 * message_size()
+
+
+def test_append_inserts_in_order_and_trims_the_oldest():
+    cache = ChatHistoryCache(max_bytes=10**6, per_chat=3)
+    messages = make_messages(4)
+    cache.put(CHAT_ID, [messages[0], messages[1], messages[3]], complete=True)
+
+    # Сообщение другого воркера может прийти позже более нового
+    cache.append(CHAT_ID, messages[2])
+    entry = cache.get(CHAT_ID)
+    assert ids(entry.messages) == [2, 3, 4]
+    assert not entry.complete
+    assert cache.stats()["bytes"] == 3 * message_size()
+
+
+def test_append_keeps_complete_while_within_per_chat():
+    cache = ChatHistoryCache(max_bytes=10**6, per_chat=3)
+    messages = make_messages(2)
+    cache.put(CHAT_ID, messages[:1], complete=True)
+    cache.append(CHAT_ID, messages[1])
+
+    entry = cache.get(CHAT_ID)
+    assert ids(entry.messages) == [1, 2]
+    assert entry.complete
+
+
+def test_append_ignores_uncached_chats():
+    cache = ChatHistoryCache(max_bytes=10**6, per_chat=3)
+    cache.append(CHAT_ID, make_messages(1)[0])
+    assert cache.get(CHAT_ID) is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_eviction_starts_above_the_byte_limit():
+    cache = ChatHistoryCache(max_bytes=4 * message_size(), per_chat=10)
+    cache.put(1, make_messages(2), complete=True)
+    cache.put(2, make_messages(2), complete=True)
+    # Ровно на пределе ничего не вытесняется
+    assert cache.stats()["chats"] == 2
+    assert cache.stats()["bytes"] == cache.max_bytes
+
+    # Рост одного чата вытесняет давно не читанный
+    cache.append(2, make_messages(1, first_id=3)[0])
+    assert cache.get(1) is None
+    assert ids(cache.get(2).messages) == [1, 2, 3]
+    assert cache.stats()["bytes"] == 3 * message_size()
+
+
+def test_eviction_spares_recently_read_chats():
+    cache = ChatHistoryCache(max_bytes=4 * message_size(), per_chat=10)
+    cache.put(1, make_messages(2), complete=True)
+    cache.put(2, make_messages(2), complete=True)
+
+    cache.get(1)
+    cache.put(3, make_messages(1), complete=True)
+    assert cache.get(2) is None
+    assert cache.get(1) is not None
+    assert cache.get(3) is not None
+
+
+def test_put_larger_than_the_limit_is_not_kept():
+    cache = ChatHistoryCache(max_bytes=2 * message_size() - 1, per_chat=10)
+    cache.put(CHAT_ID, make_messages(2), complete=True)
+    assert cache.get(CHAT_ID) is None
+    assert cache.stats() == {"chats": 0, "bytes": 0, "hits": 0, "misses": 0, "hit_ratio": 0.0}
+
+
+def test_put_replaces_the_previous_entry():
+    cache = ChatHistoryCache(max_bytes=10**6, per_chat=10)
+    cache.put(CHAT_ID, make_messages(4), complete=True)
+    cache.put(CHAT_ID, make_messages(2, first_id=10, text="longer"), complete=False)
+
+    entry = cache.get(CHAT_ID)
+    assert ids(entry.messages) == [10, 11]
+    assert not entry.complete
+    assert cache.stats()["bytes"] == 2 * message_size("longer")
+
+
+def test_disabled_cache_keeps_nothing():
+    cache = ChatHistoryCache(max_bytes=0, per_chat=10)
+    cache.put(CHAT_ID, make_messages(1), complete=True)
+    assert cache.get(CHAT_ID) is None
+
+
+# MessageService._get_cached_page
+
+def test_latest_page(cache, service):
+    cache.put(CHAT_ID, make_messages(5, first_id=6), complete=False)
+    assert ids(cached_page(service, 3, latest=True)) == [8, 9, 10]
+    assert ids(cached_page(service, 5, latest=True)) == [6, 7, 8, 9, 10]
+    # Окно неполное: за его пределами есть более старые сообщения
+    assert cached_page(service, 6, latest=True) is None
+
+
+def test_latest_page_of_a_complete_chat_may_be_short(cache, service):
+    cache.put(CHAT_ID, make_messages(2), complete=True)
+    assert ids(cached_page(service, 50, latest=True)) == [1, 2]
+
+
+def test_after_page(cache, service):
+    messages = make_messages(5, first_id=6)
+    cache.put(CHAT_ID, messages, complete=False)
+    assert ids(cached_page(service, 2, after=key(messages[1]))) == [8, 9]
+    assert ids(cached_page(service, 50, after=key(messages[3]))) == [10]
+    assert cached_page(service, 50, after=key(messages[4])) == []
+
+
+def test_after_the_oldest_cached_message(cache, service):
+    messages = make_messages(5, first_id=6)
+    cache.put(CHAT_ID, messages, complete=False)
+    # Всё, что новее самого старого сообщения окна, есть в кэше
+    assert ids(cached_page(service, 50, after=key(messages[0]))) == [7, 8, 9, 10]
+    # Курсор старше окна: между ним и окном могут быть сообщения
+    older = make_messages(1, first_id=5)[0]
+    assert cached_page(service, 50, after=key(older)) is None
+
+
+def test_after_older_than_the_window_of_a_complete_chat(cache, service):
+    cache.put(CHAT_ID, make_messages(3, first_id=6), complete=True)
+    older = make_messages(1, first_id=1)[0]
+    assert ids(cached_page(service, 2, after=key(older))) == [6, 7]
+
+
+def test_before_page(cache, service):
+    messages = make_messages(5, first_id=6)
+    cache.put(CHAT_ID, messages, complete=False)
+    assert ids(cached_page(service, 2, before=key(messages[4]))) == [8, 9]
+    assert ids(cached_page(service, 4, before=key(messages[4]))) == [6, 7, 8, 9]
+    # Частичное окно: старых сообщений в кэше меньше, чем нужно
+    assert cached_page(service, 5, before=key(messages[4])) is None
+
+
+def test_before_the_oldest_cached_message(cache, service):
+    messages = make_messages(5, first_id=6)
+    cache.put(CHAT_ID, messages, complete=False)
+    assert cached_page(service, 1, before=key(messages[0])) is None
+
+    cache.put(CHAT_ID, messages, complete=True)
+    assert cached_page(service, 1, before=key(messages[0])) == []
+    assert ids(cached_page(service, 50, before=key(messages[2]))) == [6, 7]
+
+
+def test_offset_page_needs_a_complete_chat(cache, service):
+    cache.put(CHAT_ID, make_messages(5), complete=False)
+    assert cached_page(service, 2, offset=1) is None
+
+    cache.put(CHAT_ID, make_messages(5), complete=True)
+    assert ids(cached_page(service, 2, offset=1)) == [2, 3]
+    assert ids(cached_page(service, 50)) == [1, 2, 3, 4, 5]
+    assert cached_page(service, 2, offset=5) == []
+
+
+def test_uncached_chat_is_a_miss(cache, service):
+    assert cached_page(service, 10, latest=True) is None
+    cache.put(CHAT_ID, make_messages(1), complete=True)
+    assert cached_page(service, 10, latest=True) is not None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+async def test_latest_read_fills_the_cache_window(cache, service):
+    repo = StandInMessageRepository(make_messages(4))
+    service.message_repo = repo
+
+    first = await service.get_chat_history(CHAT_ID, limit=2, latest=True)
+    assert ids(first.messages) == [3, 4]
+    # Прочитано окно кэша целиком; чат короче окна, значит запись полная
+    assert cache.get(CHAT_ID).complete
+    assert ids(cache.get(CHAT_ID).messages) == [1, 2, 3, 4]
+
+    cache.append(CHAT_ID, make_messages(1, first_id=5)[0])
+    second = await service.get_chat_history(CHAT_ID, limit=2, latest=True)
+    assert ids(second.messages) == [4, 5]
+    assert ids((await service.get_chat_history(CHAT_ID, limit=10)).messages) == [1, 2, 3, 4, 5]
+    assert repo.queries == 1
+
+
+async def test_latest_read_of_a_long_chat_is_not_complete(cache, service):
+    service.message_repo = StandInMessageRepository(make_messages(30))
+    await service.get_chat_history(CHAT_ID, limit=2, latest=True)
+
+    entry = cache.get(CHAT_ID)
+    assert ids(entry.messages) == list(range(21, 31))
+    assert not entry.complete
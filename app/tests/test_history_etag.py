@@ -0,0 +1,82 @@
+# app/tests/test_history_etag.py
+"""Conditional GET of /api/history: 304 while a page is unchanged.
+
+Runs the endpoint in process against the database from the settings,
+with both page renders; skipped when Postgres is not reachable:
+
+    python -m pytest app/tests/test_history_etag.py
+"""
+import httpx
+import pytest
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.main import app
+from app.repositories.message_repo import MessageRepository, history_cache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(params=["python", "postgres"])
+async def client(request, monkeypatch):
+    monkeypatch.setattr(settings, "HISTORY_RENDER", request.param)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+async def add_message(chat, text: str) -> int:
+    async with AsyncSessionLocal() as session:
+        message = await MessageRepository(session).create_message(
+            chat_id=chat.id,
+            sender_id=chat.user_ids[0],
+            receiver_id=chat.user_ids[1],
+            text=text,
+        )
+        return message.id
+
+
+async def test_unchanged_page_gets_304(chat, client):
+    await add_message(chat, "first")
+    url = f"/api/history/{chat.id}?latest=true"
+
+    response = await client.get(url)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == settings.HISTORY_CACHE_CONTROL
+
+    response = await client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+
+async def test_changed_page_gets_new_etag(chat, client):
+    await add_message(chat, "first")
+    url = f"/api/history/{chat.id}?latest=true"
+    etag = (await client.get(url)).headers["ETag"]
+
+    # Новое сообщение попадает в кэш истории через запись
+    await add_message(chat, "second")
+    response = await client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [m["text"] for m in response.json()["messages"]] == ["first", "second"]
+    assert response.headers["ETag"] != etag
+
+
+async def test_deleted_message_changes_offset_page(chat, client, monkeypatch):
+    # Удаление в обход репозитория кэш не видит, страница читается из базы
+    monkeypatch.setattr(history_cache, "max_bytes", 0)
+    first_id = await add_message(chat, "first")
+    await add_message(chat, "second")
+    url = f"/api/history/{chat.id}?limit=10"
+    etag = (await client.get(url)).headers["ETag"]
+
+    async with AsyncSessionLocal() as session:
+        await session.execute(text("DELETE FROM messages WHERE id = :id"), {"id": first_id})
+        await session.commit()
+    response = await client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [m["text"] for m in response.json()["messages"]] == ["second"]
+    assert response.headers["ETag"] != etag
@@ -0,0 +1,55 @@
+# app/tests/test_history_json.py
+"""Postgres-rendered history pages match the pydantic ones.
+
+Builds a small chat whose timestamps include a whole second (no
+microseconds, which ``isoformat`` leaves out) and two messages at the
+same instant, then compares offset, latest, before and after pages.
+Needs the database from the settings and is skipped when it is not
+reachable:
+
+    python -m pytest app/tests/test_history_json.py
+"""
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.database import AsyncSessionLocal
+from app.repositories.message_repo import MessageRepository, history_cache
+from app.tests.bench_history_json import check_parity
+
+pytestmark = pytest.mark.anyio
+
+
+async def add_messages(chat_id: int, user_ids: tuple):
+    whole_second = datetime.now(UTC).replace(microsecond=0) - timedelta(minutes=10)
+    timestamps = [
+        whole_second,
+        whole_second + timedelta(microseconds=500),
+        whole_second + timedelta(seconds=1, microseconds=120000),
+        # Одинаковое время: порядок задаёт id
+        whole_second + timedelta(seconds=2),
+        whole_second + timedelta(seconds=2),
+        whole_second + timedelta(seconds=3, microseconds=999999),
+    ]
+    async with AsyncSessionLocal() as session:
+        await MessageRepository(session).create_messages([
+            {
+                "chat_id": chat_id,
+                "sender_id": user_ids[k % 2],
+                "receiver_id": user_ids[(k + 1) % 2],
+                "text": f'message {k} "quoted" \\ юникод',
+                "timestamp": timestamp,
+            }
+            for k, timestamp in enumerate(timestamps)
+        ])
+
+
+async def test_json_pages_match_pydantic_pages(chat, monkeypatch):
+    monkeypatch.setattr(history_cache, "max_bytes", 0)
+    await add_messages(chat.id, chat.user_ids)
+    differences = [
+        difference
+        for limit in (1, 2, 4, 10)
+        for difference in await check_parity(chat.id, limit)
+    ]
+    assert differences == []
@@ -0,0 +1,87 @@
+# app/tests/test_partitions.py
+"""Monthly partitions of ``messages`` under concurrent maintenance.
+
+Works on a January 2000 partition, outside any real data. Needs the
+database from the settings and is skipped when it is not reachable:
+
+    python -m pytest app/tests/test_partitions.py
+"""
+import asyncio
+from datetime import UTC, datetime
+
+import pytest
+from sqlalchemy import text
+
+from app.services.partition_service import MessagePartitionMaintainer
+
+pytestmark = pytest.mark.anyio
+
+PARTITION = "messages_p2000_01"
+MONTH_START = datetime(2000, 1, 1, tzinfo=UTC)
+MONTH_END = datetime(2000, 2, 1, tzinfo=UTC)
+
+
+@pytest.fixture
+async def old_month(db_engine):
+    """Arguments of create_message_partitions that cover January 2000 only"""
+    now = datetime.now(UTC)
+    months_ahead = -((now.year - 2000) * 12 + now.month - 1)
+    yield {"start_at": MONTH_START, "months_ahead": months_ahead}
+    async with db_engine.begin() as conn:
+        await conn.execute(text(f"DROP TABLE IF EXISTS {PARTITION}"))
+
+
+async def partition_exists(conn) -> bool:
+    return await conn.scalar(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": PARTITION})
+
+
+async def test_concurrent_creation_waits_for_the_first(db_engine, old_month):
+    create = text("SELECT create_message_partitions(:start_at, :months_ahead)")
+    async with db_engine.connect() as first, db_engine.connect() as second:
+        await first.begin()
+        assert await first.scalar(create, old_month) == 1
+        second_pid = await second.scalar(text("SELECT pg_backend_pid()"))
+        racing = asyncio.ensure_future(second.scalar(create, old_month))
+
+        # Второй вызов ждёт блокировку, пока первая транзакция не завершится;
+        # о начале ожидания Postgres не сообщает, поэтому его видно только в pg_blocking_pids
+        for _ in range(500):
+            blocked = await first.scalar(
+                text("SELECT cardinality(pg_blocking_pids(:pid)) > 0"),
+                {"pid": second_pid},
+            )
+            if blocked:
+                break
+            await asyncio.sleep(0.01)
+        else:
+            pytest.fail("The second call did not wait for the first transaction")
+        await first.commit()
+
+        assert await asyncio.wait_for(racing, 5.0) == 0
+        await second.commit()
+        assert await partition_exists(second)
+
+
+async def test_retention_detaches_and_drops_expired_partitions(db_engine, old_month):
+    async with db_engine.begin() as conn:
+        await conn.execute(text("SELECT create_message_partitions(:start_at, :months_ahead)"), old_month)
+
+    maintainer = MessagePartitionMaintainer(db_engine)
+    assert await maintainer.drop_partitions(MONTH_START) == 0
+    assert await maintainer.drop_partitions(MONTH_END) == 1
+    async with db_engine.connect() as conn:
+        assert not await partition_exists(conn)
+
+
+async def test_retention_skips_while_another_worker_holds_it(db_engine, old_month):
+    async with db_engine.begin() as conn:
+        await conn.execute(text("SELECT create_message_partitions(:start_at, :months_ahead)"), old_month)
+
+    maintainer = MessagePartitionMaintainer(db_engine)
+    lock = {"lock": maintainer.RETENTION_LOCK}
+    async with db_engine.connect() as other:
+        await other.execute(text("SELECT pg_advisory_lock(hashtext(:lock))"), lock)
+        assert await maintainer.drop_partitions(MONTH_END) == 0
+        assert await partition_exists(other)
+        await other.execute(text("SELECT pg_advisory_unlock(hashtext(:lock))"), lock)
+        await other.commit()
@@ -0,0 +1,42 @@
+# app/tests/test_statements.py
+"""Statements issued per create on the repository write paths.
+
+Server defaults come back through ``INSERT ... RETURNING``, so a create
+is not followed by a SELECT. Needs the database from the settings and is
+skipped when it is not reachable:
+
+    python -m pytest app/tests/test_statements.py
+"""
+import uuid
+
+import pytest
+
+from app.database import AsyncSessionLocal
+from app.repositories.user_repo import UserRepository
+from app.tests.bench_statements import measure
+
+pytestmark = pytest.mark.anyio
+
+# create -> число запросов
+EXPECTED_STATEMENTS = {
+    "BaseRepository.create (user)": 1,
+    "ChatRepository.create_chat": 3,  # SELECT users, INSERT chats, INSERT chat_users
+    "MessageRepository.create_message": 1,
+}
+
+
+async def test_creates_issue_expected_statements(db_engine):
+    results = await measure(db_engine, iterations=3)
+    statements = {name: count for name, (count, _) in results.items()}
+    assert statements == EXPECTED_STATEMENTS
+
+
+async def test_new_user_has_no_updated_at(db_engine):
+    async with AsyncSessionLocal() as session:
+        users = UserRepository(session)
+        user = await users.create(username=f"test_{uuid.uuid4().hex}")
+        try:
+            assert user.created_at is not None
+            assert user.updated_at is None
+        finally:
+            await users.delete(user.id)
@@ -0,0 +1,226 @@
+# app/tests/test_websocket_connection.py
+"""Outbound queues of WebSocket connections: overflow policies and the writer.
+
+Runs against an in-process stand-in for the socket, no server needed:
+
+    python -m pytest app/tests/test_websocket_connection.py
+"""
+import asyncio
+from typing import List, Optional, Tuple
+
+import pytest
+
+from app.services.websocket_service import Connection, OverflowPolicy, WebSocketManager
+from app.utils.codec import EncodedFrame
+
+pytestmark = pytest.mark.anyio
+
+
+class StandInWebSocket:
+    """Records what is sent; sends wait while ``open`` is cleared, like a slow reader"""
+
+    def __init__(self):
+        self.sent: List[Tuple[str, object]] = []
+        self.open = asyncio.Event()
+        self.open.set()
+        self.closed = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        await self.open.wait()
+        self.sent.append(("text", data))
+
+    async def send_bytes(self, data: bytes):
+        await self.open.wait()
+        self.sent.append(("bytes", data))
+
+    async def close(self):
+        self.closed.set()
+
+
+def make_connection(
+        websocket: StandInWebSocket,
+        policy: OverflowPolicy,
+        max_queue: int = 2,
+        send_timeout: float = 5.0,
+        binary_threshold: int = 0,
+        failures: Optional[list] = None,
+) -> Connection:
+    return Connection(
+        websocket,
+        user_id=1,
+        max_queue=max_queue,
+        policy=policy,
+        send_timeout=send_timeout,
+        on_failure=(failures if failures is not None else []).append,
+        binary_threshold=binary_threshold,
+    )
+
+
+def queued(connection: Connection) -> List[Tuple[object, str]]:
+    return [(key, frame.text) for key, frame in connection._queue]
+
+
+def test_drop_oldest_keeps_the_newest_frames():
+    connection = make_connection(StandInWebSocket(), OverflowPolicy.DROP_OLDEST)
+    for text in ("a", "b", "c", "d"):
+        assert connection.enqueue(EncodedFrame(text))
+
+    assert queued(connection) == [(None, "c"), (None, "d")]
+    assert connection.queue_depth == 2
+    assert connection.dropped == 2
+    assert connection.coalesced == 0
+
+
+def test_coalesce_replaces_the_queued_frame_with_the_same_key():
+    connection = make_connection(StandInWebSocket(), OverflowPolicy.COALESCE)
+    connection.enqueue(EncodedFrame("typing 1"), key=("typing", 7))
+    connection.enqueue(EncodedFrame("message"))
+
+    # Замена на месте: порядок кадров сохраняется
+    assert connection.enqueue(EncodedFrame("typing 2"), key=("typing", 7))
+    assert queued(connection) == [(("typing", 7), "typing 2"), (None, "message")]
+    assert connection.coalesced == 1
+    assert connection.dropped == 0
+
+
+def test_coalesce_drops_the_oldest_without_a_matching_key():
+    connection = make_connection(StandInWebSocket(), OverflowPolicy.COALESCE)
+    connection.enqueue(EncodedFrame("typing"), key=("typing", 7))
+    connection.enqueue(EncodedFrame("first"))
+
+    assert connection.enqueue(EncodedFrame("read"), key=("read", 7))
+    assert connection.enqueue(EncodedFrame("second"))
+    assert queued(connection) == [(("read", 7), "read"), (None, "second")]
+    assert connection.dropped == 2
+    assert connection.coalesced == 0
+
+
+def test_below_the_bound_no_policy_applies():
+    for policy in OverflowPolicy:
+        connection = make_connection(StandInWebSocket(), policy, max_queue=3)
+        for text in ("a", "b", "c"):
+            assert connection.enqueue(EncodedFrame(text), key="same")
+        assert [text for _, text in queued(connection)] == ["a", "b", "c"]
+        assert (connection.dropped, connection.coalesced) == (0, 0)
+
+
+def test_disconnect_refuses_a_frame_over_the_bound():
+    connection = make_connection(StandInWebSocket(), OverflowPolicy.DISCONNECT)
+    assert connection.enqueue(EncodedFrame("a"))
+    assert connection.enqueue(EncodedFrame("b"))
+
+    assert not connection.enqueue(EncodedFrame("c"), key="c")
+    assert queued(connection) == [(None, "a"), (None, "b")]
+    assert connection.dropped == 0
+
+
+async def test_manager_closes_an_overflowing_connection_under_disconnect():
+    manager = WebSocketManager(max_queue=1, overflow_policy=OverflowPolicy.DISCONNECT)
+    websocket = StandInWebSocket()
+    websocket.open.clear()
+    await manager.connect(websocket, user_id=1)
+
+    # Первый кадр ждёт в send, второй занимает очередь, третий её переполняет
+    await manager.send_personal_message(1, "a")
+    await asyncio.sleep(0)
+    await manager.send_personal_message(1, "b")
+    await manager.send_personal_message(1, "c")
+
+    await asyncio.wait_for(websocket.closed.wait(), 5.0)
+    assert manager.stats()["connections"] == 0
+    assert manager.stats()["evicted"] == 1
+    assert websocket.sent == []
+    await manager.stop()
+
+
+async def test_writer_sends_in_order_and_large_frames_as_binary():
+    websocket = StandInWebSocket()
+    connection = make_connection(websocket, OverflowPolicy.DROP_OLDEST, max_queue=8, binary_threshold=4)
+    connection.start()
+    connection.enqueue(EncodedFrame("abc"))
+    connection.enqueue(EncodedFrame("abcd"))
+    connection.enqueue(EncodedFrame("ab"))
+
+    await connection.close(flush=True)
+    assert websocket.sent == [("text", "abc"), ("bytes", b"abcd"), ("text", "ab")]
+    assert connection.sent == 3
+
+
+async def test_flushing_close_sends_queued_frames_before_closing():
+    websocket = StandInWebSocket()
+    websocket.open.clear()
+    connection = make_connection(websocket, OverflowPolicy.DROP_OLDEST, max_queue=8)
+    connection.start()
+    for text in ("a", "b", "c"):
+        connection.enqueue(EncodedFrame(text))
+
+    closing = asyncio.ensure_future(connection.close(flush=True))
+    await asyncio.sleep(0)
+    assert not websocket.closed.is_set()
+    websocket.open.set()
+    await asyncio.wait_for(closing, 5.0)
+
+    assert [data for _, data in websocket.sent] == ["a", "b", "c"]
+    assert websocket.closed.is_set()
+    assert connection.queue_depth == 0
+
+
+async def test_flushing_close_gives_up_after_the_send_timeout():
+    websocket = StandInWebSocket()
+    websocket.open.clear()
+    connection = make_connection(websocket, OverflowPolicy.DROP_OLDEST, send_timeout=0.05)
+    connection.start()
+    connection.enqueue(EncodedFrame("a"))
+
+    await asyncio.wait_for(connection.close(flush=True), 5.0)
+    assert websocket.sent == []
+    assert websocket.closed.is_set()
+    assert connection.queue_depth == 0
+
+
+async def test_plain_close_discards_queued_frames():
+    websocket = StandInWebSocket()
+    connection = make_connection(websocket, OverflowPolicy.DROP_OLDEST)
+    connection.start()
+    connection.enqueue(EncodedFrame("a"))
+
+    await connection.close()
+    assert websocket.sent == []
+    assert websocket.closed.is_set()
+
+
+async def test_failed_send_reports_the_connection():
+    websocket = StandInWebSocket()
+    websocket.open.clear()
+    failures = []
+    connection = make_connection(websocket, OverflowPolicy.DROP_OLDEST, send_timeout=0.01, failures=failures)
+    connection.start()
+    connection.enqueue(EncodedFrame("a"))
+
+    writer = connection._writer
+    await asyncio.wait_for(writer, 5.0)
+    assert failures == [connection]
+    assert connection.sent == 0
+
+
+async def test_manager_stop_flushes_every_connection():
+    manager = WebSocketManager(max_queue=8)
+    websockets = [StandInWebSocket(), StandInWebSocket()]
+    for user_id, websocket in enumerate(websockets, start=1):
+        websocket.open.clear()
+        await manager.connect(websocket, user_id)
+        await manager.send_personal_message(user_id, f"to {user_id}")
+
+    stopping = asyncio.ensure_future(manager.stop())
+    await asyncio.sleep(0)
+    for websocket in websockets:
+        websocket.open.set()
+    await asyncio.wait_for(stopping, 5.0)
+
+    assert [websocket.sent for websocket in websockets] == [[("text", "to 1")], [("text", "to 2")]]
+    assert all(websocket.closed.is_set() for websocket in websockets)
+    assert manager.stats()["connections"] == 0
+    assert manager.stats()["evicted"] == 0
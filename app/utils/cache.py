@@ -0,0 +1,161 @@
+# app/utils/cache.py
+import bisect
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, Tuple, TypeVar
+
+ValueType = TypeVar("ValueType")
+
+
+class TTLCache(Generic[ValueType]):
+    """In-process LRU cache whose entries expire after ``ttl`` seconds"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, Tuple[float, ValueType]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[ValueType]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: ValueType):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+class HistoryEntry:
+    __slots__ = ("complete", "expires_at", "messages", "size")
+
+    def __init__(self, messages: list, complete: bool, size: int, expires_at: float):
+        self.messages = messages
+        self.complete = complete
+        self.size = size
+        self.expires_at = expires_at
+
+
+class ChatHistoryCache:
+    """Most recent messages of hot chats, LRU-evicted by total size.
+
+    Each entry holds up to ``per_chat`` newest messages of a chat in
+    ascending (timestamp, id) order; ``complete`` means the entry is the
+    whole chat. Entries expire after ``ttl`` seconds (0 - never), which
+    bounds staleness when several workers write to the same chat.
+    """
+
+    # Примерные накладные расходы на одно сообщение в памяти
+    MESSAGE_OVERHEAD_BYTES = 200
+
+    def __init__(self, max_bytes: int, per_chat: int, ttl: float = 0):
+        self.max_bytes = max_bytes
+        self.per_chat = per_chat
+        self.ttl = ttl
+        self._data: OrderedDict[int, HistoryEntry] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.per_chat > 0
+
+    def get(self, chat_id: int) -> Optional[HistoryEntry]:
+        entry = self._data.get(chat_id)
+        if entry is not None and self.ttl and entry.expires_at <= time.monotonic():
+            self.invalidate(chat_id)
+            entry = None
+        if entry is not None:
+            self._data.move_to_end(chat_id)
+        return entry
+
+    def record(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def put(self, chat_id: int, messages: list, complete: bool):
+        """Cache the newest messages of a chat, oldest first"""
+        if not self.enabled:
+            return
+        self.invalidate(chat_id)
+        if len(messages) > self.per_chat:
+            messages = messages[-self.per_chat:]
+            complete = False
+        entry = HistoryEntry(
+            list(messages),
+            complete,
+            sum(self._message_size(m) for m in messages),
+            time.monotonic() + self.ttl,
+        )
+        self._data[chat_id] = entry
+        self._bytes += entry.size
+        self._evict()
+
+    def append(self, chat_id: int, message):
+        """Write-through of a new message; ignored if the chat is not cached"""
+        entry = self._data.get(chat_id)
+        if entry is None:
+            return
+        bisect.insort(entry.messages, message, key=lambda m: (m.timestamp, m.id))
+        added = self._message_size(message)
+        entry.size += added
+        self._bytes += added
+        while len(entry.messages) > self.per_chat:
+            removed = self._message_size(entry.messages.pop(0))
+            entry.size -= removed
+            self._bytes -= removed
+            entry.complete = False
+        self._evict()
+
+    def invalidate(self, chat_id: int):
+        entry = self._data.pop(chat_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def clear(self):
+        self._data.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "chats": len(self._data),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def _message_size(self, message) -> int:
+        return len(message.text.encode()) + self.MESSAGE_OVERHEAD_BYTES
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._data:
+            _, entry = self._data.popitem(last=False)
+            self._bytes -= entry.size
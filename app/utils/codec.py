@@ -0,0 +1,130 @@
+# app/utils/codec.py
+"""Encoding and decoding of WebSocket frames.
+
+The pydantic codec has no extra dependencies. The orjson and msgspec
+codecs produce the same JSON and are used when the package is installed
+and selected with ``WS_CODEC``.
+"""
+from datetime import datetime
+from typing import Optional, Union
+
+from app.schemas.websocket_schema import WebSocketMessage, WebSocketResponse
+
+
+class EncodedFrame:
+    """A serialized frame shared by every recipient of an event.
+
+    Holds the text and/or UTF-8 form; the missing one is derived once on
+    first use, never per recipient.
+    """
+
+    __slots__ = ("_data", "_text")
+
+    def __init__(self, text: Optional[str] = None, data: Optional[bytes] = None):
+        if text is None and data is None:
+            msg = "EncodedFrame needs text or data"
+            raise ValueError(msg)
+        self._text = text
+        self._data = data
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self._data.decode()
+        return self._text
+
+    @property
+    def data(self) -> bytes:
+        if self._data is None:
+            self._data = self._text.encode()
+        return self._data
+
+    @property
+    def size(self) -> int:
+        """Length in bytes, or in characters if only the text form exists"""
+        return len(self._data) if self._data is not None else len(self._text)
+
+
+# Подтверждение одинаково для всех кадров: сериализуем один раз
+ACK_FRAME = EncodedFrame('{"status":"received"}')
+
+
+class FrameCodec:
+    """Codec built on pydantic's own JSON parser and serializer"""
+
+    name = "pydantic"
+
+    def decode_message(self, data: Union[str, bytes]) -> WebSocketMessage:
+        return WebSocketMessage.model_validate_json(data)
+
+    def encode_event(self, event: str, data: dict, timestamp: datetime) -> EncodedFrame:
+        response = WebSocketResponse(event=event, data=data, timestamp=timestamp)
+        return EncodedFrame(response.model_dump_json())
+
+
+class OrjsonCodec(FrameCodec):
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+        self._options = orjson.OPT_UTC_Z
+
+    def decode_message(self, data: Union[str, bytes]) -> WebSocketMessage:
+        return WebSocketMessage.model_validate(self._orjson.loads(data))
+
+    def encode_event(self, event: str, data: dict, timestamp: datetime) -> EncodedFrame:
+        frame = {"event": event, "data": data, "timestamp": timestamp}
+        return EncodedFrame(data=self._orjson.dumps(frame, option=self._options))
+
+
+class MsgspecCodec(FrameCodec):
+    """Validates frames with a msgspec struct and skips pydantic validation"""
+
+    name = "msgspec"
+
+    def __init__(self):
+        import msgspec
+
+        class IncomingMessage(msgspec.Struct):
+            type: str
+            chat_id: int
+            content: str
+            timestamp: Union[datetime, None] = None
+
+        self._decode_error = msgspec.DecodeError
+        self._decoder = msgspec.json.Decoder(IncomingMessage)
+        self._encoder = msgspec.json.Encoder()
+
+    def decode_message(self, data: Union[str, bytes]) -> WebSocketMessage:
+        try:
+            message = self._decoder.decode(data)
+        except self._decode_error as e:
+            raise ValueError(str(e)) from e
+        fields = {"type": message.type, "chat_id": message.chat_id, "content": message.content}
+        if message.timestamp is not None:
+            fields["timestamp"] = message.timestamp
+        return WebSocketMessage.model_construct(**fields)
+
+    def encode_event(self, event: str, data: dict, timestamp: datetime) -> EncodedFrame:
+        frame = {"event": event, "data": data, "timestamp": timestamp}
+        return EncodedFrame(data=self._encoder.encode(frame))
+
+
+CODECS = {
+    FrameCodec.name: FrameCodec,
+    OrjsonCodec.name: OrjsonCodec,
+    MsgspecCodec.name: MsgspecCodec,
+}
+
+
+def create_codec(name: str) -> FrameCodec:
+    if name not in CODECS:
+        msg = f"Unknown WebSocket codec: {name}"
+        raise ValueError(msg)
+    try:
+        return CODECS[name]()
+    except ImportError as e:
+        msg = f"WS_CODEC={name} requires the '{name}' package"
+        raise RuntimeError(msg) from e
@@ -1,159 +1,232 @@
-import asyncio
-import logging
-from datetime import UTC, datetime, timedelta
-
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
-
-logger = logging.getLogger(__name__)
-
-Base = declarative_base()
-
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Table
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
-
-chat_users = Table(
-    "chat_users",
-    Base.metadata,
-    Column("chat_id", Integer, ForeignKey("chats.id", ondelete="CASCADE")),
-    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE")),
-)
-
-
-class User(Base):
-    __tablename__ = "users"
-    id = Column(Integer, primary_key=True)
-    username = Column(String, unique=True, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
-    chats = relationship("Chat", secondary=chat_users, back_populates="participants")
-
-
-class Chat(Base):
-    __tablename__ = "chats"
-    id = Column(Integer, primary_key=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
-    participants = relationship("User", secondary=chat_users, back_populates="chats")
-    messages = relationship("Message", back_populates="chat", order_by="Message.timestamp")
-
-
-class Message(Base):
-    __tablename__ = "messages"
-    id = Column(Integer, primary_key=True)
-    text = Column(String, nullable=False)
-    chat_id = Column(Integer, ForeignKey("chats.id", ondelete="CASCADE"), nullable=False)
-    sender_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    receiver_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    timestamp = Column(DateTime(timezone=True), nullable=False)
-    chat = relationship("Chat", back_populates="messages")
-    sender = relationship("User", foreign_keys=[sender_id])
-    receiver = relationship("User", foreign_keys=[receiver_id])
-
-
-DATABASE_URL = "postgresql+asyncpg://postgres:postgres@db:5432/test_chat0203"
-engine = create_async_engine(DATABASE_URL, echo=True)
-async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-
-
-async def create_users(session: AsyncSession) -> list[User]:
-    """Create test users"""
-    users = [
-        User(username="alice"),
-        User(username="bob"),
-    ]
-    for user in users:
-        session.add(user)
-    await session.commit()
-    logger.info(f"Created users: Alice (id={users[0].id}), Bob (id={users[1].id})")
-    return users
-
-
-async def create_chat(session: AsyncSession, users: list[User]) -> Chat:
-    """Create test chat between users"""
-    chat = Chat(participants=users)
-    session.add(chat)
-    await session.commit()
-    logger.info(f"Created chat with id={chat.id}")
-    return chat
-
-
-async def create_messages(session: AsyncSession, chat: Chat, users: list[User], is_api_test: bool = True) -> list[
-    Message]:
-    """Create test conversation between users"""
-    base_time = datetime.now(UTC)
-
-    # Different conversations for API and WebSocket testing
-    api_conversation = [
-        (users[0], users[1], "Hello! This is API test chat", timedelta(minutes=0)),
-        (users[1], users[0], "Got it, testing API endpoints", timedelta(minutes=1)),
-        (users[0], users[1], "Testing message history", timedelta(minutes=2)),
-        (users[1], users[0], "Message history works fine", timedelta(minutes=3)),
-    ]
-
-    ws_conversation = [
-        (users[0], users[1], "Hi, Bob!", timedelta(minutes=0)),
-        (users[1], users[0], "Hi, Alice!", timedelta(minutes=1)),
-        (users[0], users[1], "How are you?", timedelta(minutes=2)),
-        (users[1], users[0], "I'm good!", timedelta(minutes=3)),
-        (users[0], users[1], "What's new?", timedelta(minutes=4)),
-        (users[1], users[0], "Working on a project", timedelta(minutes=5)),
-    ]
-
-    conversation = api_conversation if is_api_test else ws_conversation
-    messages = []
-
-    for sender, receiver, text, time_offset in conversation:
-        message = Message(
-            text=text,
-            chat_id=chat.id,
-            sender_id=sender.id,
-            receiver_id=receiver.id,
-            timestamp=base_time + time_offset,
-        )
-        session.add(message)
-        messages.append(message)
-        logger.debug(f"Created message: {sender.username} -> {receiver.username}: {text}")
+"""Synthetic chat dataset for local testing, benchmarks and index tuning.
 
-    await session.commit()
-    logger.info(f"Created {len(messages)} messages in chat {chat.id}")
-    return messages
+Users, two-person chats and messages are generated in Python and streamed
+into Postgres with ``COPY`` (asyncpg ``copy_records_to_table``), so tens of
+millions of messages load in minutes. Message counts per chat follow a Zipf
+distribution: a few hot chats hold most of the history, like in production.
 
+The schema comes from Alembic (``messages`` is partitioned), so run
+``alembic upgrade head`` first:
 
-async def create_test_data():
-    """Create test data for chat"""
-    logger.info("Starting test data creation")
-
+    python -m app.utils.create_test_data --users 100000 --chats 200000 \\
+        --messages-per-chat 100 --skew 1.1 --days 365 --reset
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import UTC, datetime, timedelta
+from typing import Iterator, List, Tuple
+
+import asyncpg
+
+from app.config import settings
+from app.models.chat import Chat, chat_users
+from app.models.message import Message
+from app.models.user import User
+from app.utils.logger import logger
+
+TEXTS = [
+    "Hi!",
+    "How are you?",
+    "I'm good, thanks",
+    "What's new?",
+    "Working on a project",
+    "Let's meet tomorrow",
+    "Sounds good to me",
+    "Did you see the latest release?",
+    "Sending the report in a minute",
+    "Can you review my pull request when you have a moment?",
+]
+
+
+def table_columns(table) -> List[str]:
+    return [column.name for column in table.columns]
+
+
+def chat_message_counts(chats: int, messages_per_chat: int, skew: float) -> List[int]:
+    """Messages per chat: Zipf weights scaled to ``chats * messages_per_chat``"""
+    weights = [1 / rank ** skew for rank in range(1, chats + 1)]
+    scale = chats * messages_per_chat / sum(weights)
+    return [max(1, round(weight * scale)) for weight in weights]
+
+
+def generate_messages(
+        chats: List[Tuple[int, int, int]],
+        counts: List[int],
+        first_id: int,
+        start: datetime,
+        span: timedelta,
+        rng: random.Random,
+) -> Iterator[tuple]:
+    """Rows of ``messages`` in column order, ascending time within each chat"""
+    message_id = first_id
+    span_seconds = span.total_seconds()
+    for (chat_id, first_user, second_user), count in zip(chats, counts):
+        step = span_seconds / count
+        for k in range(count):
+            if rng.random() < 0.5:
+                sender_id, receiver_id = first_user, second_user
+            else:
+                sender_id, receiver_id = second_user, first_user
+            timestamp = start + timedelta(seconds=(k + rng.random()) * step)
+            yield message_id, rng.choice(TEXTS), chat_id, sender_id, receiver_id, timestamp
+            message_id += 1
+
+
+def chunked(rows: Iterator[tuple], size: int) -> Iterator[List[tuple]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def next_id(conn: asyncpg.Connection, table: str) -> int:
+    return await conn.fetchval(f"SELECT coalesce(max(id), 0) + 1 FROM {table}")
+
+
+async def check_schema(conn: asyncpg.Connection):
+    relkind = await conn.fetchval(
+        "SELECT relkind::text FROM pg_class WHERE oid = to_regclass($1)",
+        Message.__tablename__,
+    )
+    if relkind != "p":
+        msg = "Partitioned messages table not found, run 'alembic upgrade head' first"
+        raise RuntimeError(msg)
+
+
+async def create_test_data(
+        users: int,
+        chats: int,
+        messages_per_chat: int,
+        skew: float,
+        days: int,
+        batch_rows: int,
+        seed: int,
+        reset: bool,
+):
+    """Bulk-load a synthetic dataset"""
+    rng = random.Random(seed)
+    conn = await asyncpg.connect(settings.get_database_url().replace("+asyncpg", ""))
     try:
-        # Recreate all tables
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.drop_all)
-            await conn.run_sync(Base.metadata.create_all)
-        logger.info("Database tables recreated")
-
-        async with async_session() as session:
-            users = await create_users(session)
-
-            # Create API test chat
-            api_chat = await create_chat(session, users)
-            await create_messages(session, api_chat, users, is_api_test=True)
-            logger.info(f"\nAPI test chat created with ID: {api_chat.id}")
-            logger.info(f"Test API endpoint: GET http://localhost:8000/api/history/{api_chat.id}")
-
-            # Create WebSocket test chat
-            ws_chat = await create_chat(session, users)
-            await create_messages(session, ws_chat, users, is_api_test=False)
-            logger.info(f"\nWebSocket test chat created with ID: {ws_chat.id}")
-            logger.info("WebSocket test endpoints:")
-            logger.info(f"ws://localhost:8000/ws/{users[0].id}  # Connect as Alice")
-            logger.info(f"ws://localhost:8000/ws/{users[1].id}  # Connect as Bob")
-            logger.info(f"Using chat_id: {ws_chat.id}")
-
-    except Exception as e:
-        logger.error(f"Error creating test data: {e!s}")
-        raise
+        await check_schema(conn)
+        if reset:
+            await conn.execute(
+                f"TRUNCATE {Message.__tablename__}, {chat_users.name}, "
+                f"{Chat.__tablename__}, {User.__tablename__} RESTART IDENTITY CASCADE",
+            )
+            logger.info("Existing data truncated")
+
+        # Данные согласованы по построению: без триггеров проверки FK на каждую строку
+        try:
+            await conn.execute("SET session_replication_role = replica")
+        except asyncpg.InsufficientPrivilegeError:
+            logger.warning("Not a superuser: foreign keys are checked row by row, loading is slower")
+
+        started = time.perf_counter()
+        now = datetime.now(UTC)
+        span = timedelta(days=days)
+        await conn.execute("SELECT create_message_partitions($1, 0)", now - span)
+
+        first_user = await next_id(conn, User.__tablename__)
+        user_ids = list(range(first_user, first_user + users))
+        await conn.copy_records_to_table(
+            User.__tablename__,
+            records=[(user_id, f"user_{user_id}", now) for user_id in user_ids],
+            columns=["id", "username", "created_at"],
+        )
+
+        first_chat = await next_id(conn, Chat.__tablename__)
+        chat_rows = [
+            (first_chat + i, *rng.sample(user_ids, 2))
+            for i in range(chats)
+        ]
+        await conn.copy_records_to_table(
+            Chat.__tablename__,
+            records=[(chat_id, now) for chat_id, _, _ in chat_rows],
+            columns=["id", "created_at"],
+        )
+        await conn.copy_records_to_table(
+            chat_users.name,
+            records=[
+                (chat_id, user_id)
+                for chat_id, *participants in chat_rows
+                for user_id in participants
+            ],
+            columns=["chat_id", "user_id"],
+        )
+        logger.info("Created %s users and %s chats", users, chats)
+
+        counts = chat_message_counts(chats, messages_per_chat, skew)
+        total = sum(counts)
+        rows = generate_messages(
+            chat_rows,
+            counts,
+            await next_id(conn, Message.__tablename__),
+            now - span,
+            span,
+            rng,
+        )
+        loaded = 0
+        for chunk in chunked(rows, batch_rows):
+            await conn.copy_records_to_table(
+                Message.__tablename__,
+                records=chunk,
+                columns=table_columns(Message.__table__),
+            )
+            loaded += len(chunk)
+            logger.info(
+                "Loaded %s/%s messages (%.0f rows/s)",
+                loaded,
+                total,
+                loaded / (time.perf_counter() - started),
+            )
+
+        # Последовательности продолжают нумерацию после явных id
+        for table in (User.__tablename__, Chat.__tablename__, Message.__tablename__):
+            await conn.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"(SELECT max(id) FROM {table}))",
+            )
+            await conn.execute(f"ANALYZE {table}")
+        await conn.execute(f"ANALYZE {chat_users.name}")
+
+        hot_chat, first, second = chat_rows[0]
+        logger.info(
+            "Loaded %s messages in %.1fs; hottest chat %s has %s messages",
+            total,
+            time.perf_counter() - started,
+            hot_chat,
+            counts[0],
+        )
+        logger.info("Test API endpoint: GET http://localhost:8000/api/history/%s", hot_chat)
+        logger.info("WebSocket test endpoints: ws://localhost:8000/ws/%s, ws://localhost:8000/ws/%s", first, second)
+    finally:
+        await conn.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(create_test_data())
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--messages-per-chat", type=int, default=20, help="average over all chats")
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent, 0 - uniform")
+    parser.add_argument("--days", type=int, default=30, help="history spans this many days")
+    parser.add_argument("--batch-rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reset", action="store_true", help="truncate existing data first")
+    args = parser.parse_args()
+    asyncio.run(create_test_data(
+        args.users,
+        args.chats,
+        args.messages_per_chat,
+        args.skew,
+        args.days,
+        args.batch_rows,
+        args.seed,
+        args.reset,
+    ))
@@ -0,0 +1,35 @@
+# app/utils/cursor.py
+import base64
+from datetime import datetime
+from typing import Tuple
+
+CURSOR_SEPARATOR = "|"
+
+
+def encode_cursor(timestamp: datetime, message_id: int) -> str:
+    """Build an opaque keyset cursor from a message position."""
+    raw = f"{timestamp.isoformat()}{CURSOR_SEPARATOR}{message_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Parse a cursor produced by encode_cursor.
+
+    Raises:
+        ValueError: if the cursor is malformed or its timestamp has no time zone
+
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        timestamp, message_id = raw.rsplit(CURSOR_SEPARATOR, 1)
+        position = datetime.fromisoformat(timestamp), int(message_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        msg = "Invalid cursor"
+        raise ValueError(msg) from e
+
+    # Наивное время нельзя сравнить с timestamptz из базы и кэша
+    if position[0].utcoffset() is None:
+        msg = "Invalid cursor"
+        raise ValueError(msg)
+    return position
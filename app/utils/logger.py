@@ -1,23 +1,102 @@
+import atexit
+import json
 import logging
+import queue
+import random
 import sys
-from datetime import datetime
+import threading
+import time
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener
+
+from app.config import settings
 
 logger = logging.getLogger("chat_app")
-logger.setLevel(logging.INFO)
+logger.setLevel(settings.LOG_LEVEL)
 
+# Логи на каждое сообщение WebSocket: выборка и ограничение частоты
+message_logger = logging.getLogger("chat_app.messages")
 
-formatter = logging.Formatter(
-    "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, UTC).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a random ``sample_rate`` share of records, at most ``max_per_second``.
+
+    Dropped records are never formatted or queued.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, max_per_second: int = 0):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.max_per_second = max_per_second
+        self._window = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:  # noqa: S311
+            return False
+        if self.max_per_second <= 0:
+            return True
+
+        window = int(time.monotonic())
+        with self._lock:
+            if window != self._window:
+                self._window = window
+                self._count = 0
+            self._count += 1
+            return self._count <= self.max_per_second
+
+
+class InProcessQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+if settings.LOG_FORMAT == "json":
+    formatter = JsonFormatter()
+else:
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
 
 
 console_handler = logging.StreamHandler(sys.stdout)
 console_handler.setFormatter(formatter)
-logger.addHandler(console_handler)
 
 
 file_handler = logging.FileHandler(f"logs/chat_app_{datetime.now().strftime('%Y%m%d')}.log")
 file_handler.setFormatter(formatter)
-logger.addHandler(file_handler)
 
-__all__ = ["logger"]
+if settings.LOG_QUEUE:
+    # Запись на диск идёт в отдельном потоке, а не в цикле событий
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    logger.addHandler(InProcessQueueHandler(log_queue))
+    listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+else:
+    logger.addHandler(console_handler)
+    logger.addHandler(file_handler)
+
+message_logger.addFilter(
+    SamplingFilter(settings.LOG_MESSAGE_SAMPLE_RATE, settings.LOG_MESSAGE_MAX_PER_SECOND),
+)
+
+__all__ = ["logger", "message_logger"]
@@ -0,0 +1,176 @@
+# app/utils/metrics.py
+"""In-process metrics rendered in the Prometheus text format.
+
+Every worker process keeps its own counters: recording is a few integer
+additions on the event loop thread, with no locks and no I/O, so it stays
+on in production. Scrape each worker (or aggregate in Prometheus by
+``instance``). Gauges that mirror existing state are read from callbacks
+at scrape time and cost nothing on the hot path.
+"""
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+SIZE_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {_format(self.value)}",
+        ]
+
+
+class Histogram:
+    """Cumulative histogram; ``labels`` returns one child per label value set"""
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            buckets: Sequence[float] = LATENCY_BUCKETS,
+            label_names: Sequence[str] = (),
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        self._children: Dict[Tuple[str, ...], "Histogram"] = {}
+        # Счётчики по корзинам, последняя - +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def labels(self, *values: str) -> "Histogram":
+        child = self._children.get(values)
+        if child is None:
+            child = Histogram(self.name, self.documentation, self.buckets)
+            self._children[values] = child
+        return child
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        series = self._children.items() if self.label_names else [((), self)]
+        for values, histogram in series:
+            cumulative = 0
+            bounds = [*(_format(b) for b in self.buckets), "+Inf"]
+            for bound, count in zip(bounds, histogram.counts):
+                cumulative += count
+                labels = _labels(self.label_names, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.label_names, values)
+            lines.append(f"{self.name}_sum{labels} {_format(histogram.sum)}")
+            lines.append(f"{self.name}_count{labels} {histogram.count}")
+        return lines
+
+
+class StatsGauges:
+    """Numeric values of a ``stats()`` dict exposed as ``<prefix>_<key>`` gauges"""
+
+    def __init__(self, prefix: str, documentation: str, collect: Callable[[], dict]):
+        self.prefix = prefix
+        self.documentation = documentation
+        self._collect = collect
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, value in self._collect().items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{self.prefix}_{key}"
+            lines.append(f"# HELP {name} {self.documentation}: {key}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_format(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        name = getattr(metric, "name", None) or metric.prefix
+        self._metrics[name] = metric
+        return metric
+
+    def histogram(self, name: str, documentation: str, **kwargs) -> Histogram:
+        return self.register(Histogram(name, documentation, **kwargs))
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self.register(Counter(name, documentation))
+
+    def stats(self, prefix: str, documentation: str, collect: Callable[[], dict]) -> StatsGauges:
+        return self.register(StatsGauges(prefix, documentation, collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+history_latency = registry.histogram(
+    "chat_history_request_seconds",
+    "Latency of GET /api/history/{chat_id}",
+)
+ws_stage_latency = registry.histogram(
+    "chat_ws_stage_seconds",
+    "Latency of each stage of handling an inbound WebSocket message",
+    label_names=("stage",),
+)
+broadcast_fanout = registry.histogram(
+    "chat_broadcast_fanout",
+    "Local recipients enqueued per broadcast",
+    buckets=SIZE_BUCKETS,
+)
+db_pool_wait = registry.histogram(
+    "chat_db_pool_checkout_wait_seconds",
+    "Time a checkout waits for an idle connection in the database pool",
+)
+db_connect = registry.histogram(
+    "chat_db_connect_seconds",
+    "Time spent opening a new database connection for the pool",
+)
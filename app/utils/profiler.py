@@ -0,0 +1,194 @@
+# app/utils/profiler.py
+"""Opt-in sampling profiler for the event loop.
+
+While running, a background thread samples the event loop thread's stack
+every ``interval`` seconds and aggregates the samples as folded stacks
+(``frame;frame;frame count``), the input format of flamegraph.pl,
+speedscope and inferno. A heartbeat coroutine lets the same thread notice
+when the loop has not run for ``block_threshold`` seconds and record what
+is blocking it. Requests and frames wrapped in ``trace`` that take longer
+than ``slow_threshold`` are kept with the SQL statements they issued.
+
+Nothing is hooked while the profiler is stopped: ``trace`` returns after
+one attribute check and the SQL listeners are removed.
+"""
+import asyncio
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Deque, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.utils.logger import logger
+
+_current_trace: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar(
+    "profiler_trace", default=None,
+)
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename.split(os.sep)
+    return f"{code.co_qualname} ({'/'.join(path[-2:])}:{frame.f_lineno})"
+
+
+def _folded(frame) -> str:
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class LoopProfiler:
+    def __init__(self, max_records: int = 100):
+        self.running = False
+        self.interval = 0.005
+        self.block_threshold = 0.1
+        self.slow_threshold = 0.5
+        self.samples: Counter = Counter()
+        self.blocks: Deque[dict] = deque(maxlen=max_records)
+        self.slow: Deque[dict] = deque(maxlen=max_records)
+        self._engine: Optional[Engine] = None
+        self._loop_thread_id: Optional[int] = None
+        self._sampler: Optional[threading.Thread] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._tick = 0.0
+        self._stall_tick: Optional[float] = None
+        self._stopped = threading.Event()
+        # Выборки пишет поток профилировщика, читает event loop
+        self._lock = threading.Lock()
+
+    def start(
+            self,
+            engine: Engine,
+            interval: float = 0.005,
+            block_threshold: float = 0.1,
+            slow_threshold: float = 0.5,
+    ):
+        """Start sampling the current event loop; must be called on the loop"""
+        if self.running:
+            self.stop()
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.slow_threshold = slow_threshold
+        with self._lock:
+            self.samples.clear()
+            self.blocks.clear()
+        self.slow.clear()
+
+        self._engine = engine
+        event.listen(engine, "before_cursor_execute", self._before_execute)
+        event.listen(engine, "after_cursor_execute", self._after_execute)
+
+        self._loop_thread_id = threading.get_ident()
+        self._tick = time.perf_counter()
+        self._stall_tick = None
+        self._stopped.clear()
+        self._heartbeat = asyncio.get_running_loop().create_task(self._beat())
+        self._sampler = threading.Thread(target=self._sample, name="loop-profiler", daemon=True)
+        self.running = True
+        self._sampler.start()
+        logger.info("Profiler started: interval %.3fs, block threshold %.3fs", interval, block_threshold)
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self._stopped.set()
+        self._sampler.join()
+        self._heartbeat.cancel()
+        event.remove(self._engine, "before_cursor_execute", self._before_execute)
+        event.remove(self._engine, "after_cursor_execute", self._after_execute)
+        self._sampler = self._heartbeat = self._engine = None
+        logger.info("Profiler stopped: %s samples", self.samples.total())
+
+    def folded(self) -> str:
+        """Samples in the folded stack format, one stack per line"""
+        with self._lock:
+            stacks = self.samples.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def report(self) -> dict:
+        with self._lock:
+            samples = self.samples.total()
+            blocks = [dict(block) for block in self.blocks]
+        return {
+            "running": self.running,
+            "samples": samples,
+            "blocks": blocks,
+            "slow": list(self.slow),
+        }
+
+    @contextmanager
+    def trace(self, kind: str, name: str) -> Iterator[None]:
+        """Record a request or frame that takes longer than ``slow_threshold``"""
+        if not self.running:
+            yield
+            return
+
+        record = {"kind": kind, "name": name, "statements": []}
+        token = _current_trace.set(record)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started
+            _current_trace.reset(token)
+            if duration >= self.slow_threshold:
+                record["duration_ms"] = round(duration * 1000, 3)
+                self.slow.append(record)
+                logger.warning(
+                    "Slow %s %s: %.1f ms, %s SQL statements",
+                    kind,
+                    name,
+                    duration * 1000,
+                    len(record["statements"]),
+                )
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if _current_trace.get() is not None:
+            context._profiler_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        record = _current_trace.get()
+        started = getattr(context, "_profiler_started", None)
+        if record is not None and started is not None:
+            record["statements"].append({
+                "sql": statement,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            })
+
+    async def _beat(self):
+        while True:
+            self._tick = time.perf_counter()
+            await asyncio.sleep(self.interval)
+
+    def _sample(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = _folded(frame)
+            # Цикл не доходил до heartbeat дольше порога - он заблокирован
+            tick = self._tick
+            lag = time.perf_counter() - tick - self.interval
+
+            with self._lock:
+                self.samples[stack] += 1
+                if lag < self.block_threshold:
+                    continue
+                if self._stall_tick != tick:
+                    self._stall_tick = tick
+                    self.blocks.append({"duration_ms": 0.0, "stack": stack})
+                    logger.warning("Event loop blocked for %.1f ms in %s", lag * 1000, _frame_name(frame))
+                self.blocks[-1]["duration_ms"] = round(lag * 1000, 3)
+
+
+profiler = LoopProfiler()
@@ -0,0 +1,40 @@
+"""hot_path_indexes
+
+Revision ID: 9c2e4b7d1a53
+Revises: 5fbb731927b2
+Create Date: 2026-10-18 10:12:41.503218
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9c2e4b7d1a53"
+down_revision: Union[str, None] = "5fbb731927b2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Строки без ключа и дубликаты не позволят создать первичный ключ
+    op.execute("DELETE FROM chat_users WHERE chat_id IS NULL OR user_id IS NULL")
+    op.execute(
+        "DELETE FROM chat_users a USING chat_users b "
+        "WHERE a.ctid < b.ctid AND a.chat_id = b.chat_id AND a.user_id = b.user_id",
+    )
+    op.alter_column("chat_users", "chat_id", existing_type=sa.Integer(), nullable=False)
+    op.alter_column("chat_users", "user_id", existing_type=sa.Integer(), nullable=False)
+    op.create_primary_key("chat_users_pkey", "chat_users", ["chat_id", "user_id"])
+    op.create_index("ix_chat_users_user_id_chat_id", "chat_users", ["user_id", "chat_id"])
+    op.create_index("ix_messages_chat_id_timestamp_id", "messages", ["chat_id", "timestamp", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_messages_chat_id_timestamp_id", table_name="messages")
+    op.drop_index("ix_chat_users_user_id_chat_id", table_name="chat_users")
+    op.drop_constraint("chat_users_pkey", "chat_users", type_="primary")
+    op.alter_column("chat_users", "user_id", existing_type=sa.Integer(), nullable=True)
+    op.alter_column("chat_users", "chat_id", existing_type=sa.Integer(), nullable=True)
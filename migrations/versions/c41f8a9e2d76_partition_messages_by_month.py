@@ -0,0 +1,126 @@
+"""partition_messages_by_month
+
+Revision ID: c41f8a9e2d76
+Revises: 9c2e4b7d1a53
+Create Date: 2026-10-18 14:37:09.218455
+
+"""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c41f8a9e2d76"
+down_revision: Union[str, None] = "9c2e4b7d1a53"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+CREATE_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_message_partitions(start_at timestamptz, months_ahead integer)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    month_start date := date_trunc('month', start_at AT TIME ZONE 'UTC')::date;
+    last_month date := (date_trunc('month', now() AT TIME ZONE 'UTC') + make_interval(months => months_ahead))::date;
+    partition_name text;
+    created integer := 0;
+BEGIN
+    -- Воркеры вызывают функцию одновременно: проверка и CREATE TABLE идут по очереди
+    PERFORM pg_advisory_xact_lock(hashtext('create_message_partitions'));
+    WHILE month_start <= last_month LOOP
+        partition_name := format('messages_p%s', to_char(month_start, 'YYYY_MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                month_start::timestamp AT TIME ZONE 'UTC',
+                (month_start + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+            );
+            created := created + 1;
+        END IF;
+        month_start := (month_start + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END
+$$
+"""
+
+EXPIRED_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION expired_message_partitions(older_than timestamptz)
+RETURNS TABLE (partition_name text, detach_pending boolean) LANGUAGE sql STABLE AS $$
+    SELECT c.relname::text, i.inhdetachpending
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'messages'::regclass
+      AND c.relname ~ '^messages_p[0-9]{4}_[0-9]{2}$'
+      AND (to_date(substring(c.relname from 11), 'YYYY_MM') + interval '1 month')::timestamp
+          AT TIME ZONE 'UTC' <= older_than
+    ORDER BY c.relname
+$$
+"""
+
+COLUMNS = "id, text, chat_id, sender_id, receiver_id, timestamp"
+
+
+def upgrade() -> None:
+    # Старая таблица остаётся источником данных до конца переноса
+    op.execute("ALTER TABLE messages RENAME TO messages_old")
+    op.execute("ALTER TABLE messages_old RENAME CONSTRAINT messages_pkey TO messages_old_pkey")
+    op.drop_index("ix_messages_chat_id_timestamp_id", table_name="messages_old")
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY NONE")
+
+    op.create_table("messages",
+    sa.Column("id", sa.Integer(), server_default=sa.text("nextval('messages_id_seq')"), nullable=False),
+    sa.Column("text", sa.String(), nullable=False),
+    sa.Column("chat_id", sa.Integer(), nullable=False),
+    sa.Column("sender_id", sa.Integer(), nullable=False),
+    sa.Column("receiver_id", sa.Integer(), nullable=False),
+    sa.Column("timestamp", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+    sa.ForeignKeyConstraint(["chat_id"], ["chats.id"], ondelete="CASCADE"),
+    sa.ForeignKeyConstraint(["receiver_id"], ["users.id"], ondelete="CASCADE"),
+    sa.ForeignKeyConstraint(["sender_id"], ["users.id"], ondelete="CASCADE"),
+    sa.PrimaryKeyConstraint("id", "timestamp"),
+    postgresql_partition_by="RANGE (timestamp)",
+    )
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY messages.id")
+    op.create_index("ix_messages_chat_id_timestamp_id", "messages", ["chat_id", "timestamp", "id"])
+
+    op.execute(CREATE_PARTITIONS_FUNCTION)
+    op.execute(EXPIRED_PARTITIONS_FUNCTION)
+    op.execute(
+        "SELECT create_message_partitions("
+        f"coalesce((SELECT min(timestamp) FROM messages_old), now()), {MONTHS_AHEAD})",
+    )
+
+    op.execute(f"INSERT INTO messages ({COLUMNS}) SELECT {COLUMNS} FROM messages_old")
+    op.drop_table("messages_old")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE messages RENAME TO messages_partitioned")
+    op.execute("ALTER TABLE messages_partitioned RENAME CONSTRAINT messages_pkey TO messages_partitioned_pkey")
+    op.drop_index("ix_messages_chat_id_timestamp_id", table_name="messages_partitioned")
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY NONE")
+
+    op.create_table("messages",
+    sa.Column("id", sa.Integer(), server_default=sa.text("nextval('messages_id_seq')"), nullable=False),
+    sa.Column("text", sa.String(), nullable=False),
+    sa.Column("chat_id", sa.Integer(), nullable=False),
+    sa.Column("sender_id", sa.Integer(), nullable=False),
+    sa.Column("receiver_id", sa.Integer(), nullable=False),
+    sa.Column("timestamp", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+    sa.ForeignKeyConstraint(["chat_id"], ["chats.id"], ondelete="CASCADE"),
+    sa.ForeignKeyConstraint(["receiver_id"], ["users.id"], ondelete="CASCADE"),
+    sa.ForeignKeyConstraint(["sender_id"], ["users.id"], ondelete="CASCADE"),
+    sa.PrimaryKeyConstraint("id"),
+    )
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY messages.id")
+    op.execute(f"INSERT INTO messages ({COLUMNS}) SELECT {COLUMNS} FROM messages_partitioned")
+    op.create_index("ix_messages_chat_id_timestamp_id", "messages", ["chat_id", "timestamp", "id"])
+
+    op.drop_table("messages_partitioned")
+    op.execute("DROP FUNCTION expired_message_partitions(timestamptz)")
+    op.execute("DROP FUNCTION create_message_partitions(timestamptz, integer)")